@@ -0,0 +1,182 @@
+""" DeadEndFilling.py """
+
+"""
+Solves a maze by filling its dead ends instead of searching it.
+
+A dead end is a cell with one way out. If it is neither the start nor a goal, no
+path worth taking goes through it, so it can be filled (removed). That can turn the
+cell it hung from into a new dead end, and so on. In a maze from get_maze, which is
+a tree, filling until no dead ends are left keeps exactly the cells on the paths
+between the start and the goals.
+
+The number of ways out of every cell (its degree, see mazestats.py) is kept in a
+NumPy array and the dead ends are filled in waves: all the current dead ends are
+filled at once, the degree of the cells they hung from is lowered, and the cells
+that got degree 1 are the next wave. Every wave is a few NumPy operations on the
+cells in it, no matter how large the maze is.
+
+Most mazes have a lot of short dead ends, so the first waves are large and the
+rest are small. In a long winding corridor (e.g. from backtracker) every wave is a
+single cell and NumPy would spend more time getting started than working, so the
+waves smaller than SMALL_WAVE cells are filled one cell at a time from a queue.
+Every cell is filled at most once, so either way the work is O(V).
+
+Every filled cell remembers the cell it hung from (its parent). Following the
+parents from a filled cell leads back to a cell that was kept, so:
+
+- With a start and a goal, the cells that are kept are the path.
+- With only a start (goals=None) everything is filled down to the start, and the
+  parents lead from every cell straight back to it. One filling then answers
+  the path to any goal, taking time proportional to the length of the path.
+
+Class methods:
+
+path(goal) - The path from the start to a cell as a list of indexes
+distance(goal) - The number of steps from the start to a cell
+
+The cells can be given as Nodes, (x, y) positions or flat indexes. A cell that can
+not be reached from the start has the path [] and the distance -1. In a maze with
+loops the paths from filled cells are still paths, but not always the shortest.
+
+"""
+
+from collections import deque
+
+import numpy as np
+
+from GridMaze import GridMaze
+from mazestats import degrees
+
+
+# Smaller waves than this are filled one cell at a time
+SMALL_WAVE = 64
+
+
+class DeadEndFilling:
+
+    def __init__(self, maze, start=0, goals=None):
+        if not isinstance(maze, GridMaze):
+            maze = GridMaze.from_graph(maze)
+        self.maze = maze
+        self.start = maze.index(start)
+        keep = np.zeros(len(maze), dtype=bool)
+        keep[self.start] = True
+        for goal in goals or []:
+            keep[maze.index(goal)] = True
+        self.waves = 0
+        self._fill(keep)
+        # The path from the start to every kept cell, made when first asked for
+        self._kept_parent = None
+
+    def _fill(self, keep):
+        maze = self.maze
+        width = maze.width
+        size = len(maze)
+        right = np.asarray(maze.right)
+        down = np.asarray(maze.down)
+        degree = degrees(maze)
+        alive = np.ones(size, dtype=bool)
+        parent = np.full(size, -1, dtype=np.int32)
+        # Which entry of the candidates a cell was last written from
+        owner = np.empty(size, dtype=np.int64)
+        leaves = np.flatnonzero((degree == 1) & ~keep)
+        while leaves.size >= SMALL_WAVE:
+            self.waves += 1
+            alive[leaves] = False
+            x = leaves % width
+            reached = []
+            for step, passage in ((1, ~right[leaves]),
+                                  (-1, (x > 0) & ~right[leaves - 1]),
+                                  (width, ~down[leaves]),
+                                  (-width, (leaves >= width) & ~down[leaves - width])):
+                fro = leaves[passage]
+                to = fro + step
+                # Dead ends filled in this wave are not followed. That only happens
+                # to the last two cells of a part of the maze without the start
+                live = alive[to]
+                fro, to = fro[live], to[live]
+                parent[fro] = to
+                # Every cell is next to at most one dead end in each direction, so
+                # no cell is lowered twice by the same subtraction
+                degree[to] -= 1
+                reached.append(to)
+            candidates = np.concatenate(reached)
+            candidates = candidates[(degree[candidates] == 1) & ~keep[candidates]]
+            # A cell that lost two dead ends at once is only taken once
+            order = np.arange(candidates.size)
+            owner[candidates] = order
+            leaves = candidates[owner[candidates] == order]
+
+        # The rest one cell at a time, on plain lists to keep the loop fast
+        right = right.tolist()
+        down = down.tolist()
+        degree = degree.tolist()
+        keep = keep.tolist()
+        alive = alive.tolist()
+        parent = parent.tolist()
+        queue = deque(leaves.tolist())
+        while queue:
+            i = queue.popleft()
+            alive[i] = False
+            x = i % width
+            if not right[i] and alive[i + 1]:
+                n = i + 1
+            elif x > 0 and not right[i - 1] and alive[i - 1]:
+                n = i - 1
+            elif i + width < size and not down[i] and alive[i + width]:
+                n = i + width
+            elif i >= width and not down[i - width] and alive[i - width]:
+                n = i - width
+            else:
+                continue
+            parent[i] = n
+            degree[n] -= 1
+            if degree[n] == 1 and not keep[n]:
+                queue.append(n)
+        self.alive = np.array(alive, dtype=bool)
+        self.parent = np.array(parent, dtype=np.int32)
+        # Walking a list is much faster than walking the array one cell at a time
+        self._parent_list = parent
+        self._alive_list = alive
+
+    def _kept_paths(self) -> dict:
+        """ Searches the cells that were kept from the start. Gives the cell every
+            one of them was reached from. """
+        if self._kept_parent is None:
+            maze = self.maze
+            alive = self._alive_list
+            kept_parent = {self.start: -1}
+            order = [self.start]
+            for i in order:
+                for n in maze.cell_neighbors(i):
+                    if alive[n] and not n in kept_parent:
+                        kept_parent[n] = i
+                        order.append(n)
+            self._kept_parent = kept_parent
+        return self._kept_parent
+
+    def path(self, goal) -> list:
+        """ The path from the start to goal as a list of flat indexes. """
+        parent = self._parent_list
+        i = self.maze.index(goal)
+        # Down from the goal to the first cell that was kept
+        tail = []
+        while parent[i] >= 0:
+            tail.append(i)
+            i = parent[i]
+        if not self._alive_list[i]:
+            # A part of the maze without the start was filled completely
+            return []
+        kept_parent = self._kept_paths() if i != self.start else {i: -1}
+        if not i in kept_parent:
+            return []
+        path = []
+        while i >= 0:
+            path.append(i)
+            i = kept_parent[i]
+        path.reverse()
+        tail.reverse()
+        return path + tail
+
+    def distance(self, goal) -> int:
+        return len(self.path(goal)) - 1
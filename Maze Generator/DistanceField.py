@@ -0,0 +1,89 @@
+""" DistanceField.py """
+
+"""
+The distance from one cell (the start) to every cell of a maze.
+
+One breadth-first search from the start over the whole maze (GridMaze.bfs) gives,
+as flat int32 arrays with one entry per cell:
+
+dist   - the number of steps from the start, -1 if the cell can not be reached
+parent - the cell every cell was reached from, -1 for the start and unreachable cells
+order  - the reached cells in the order they were reached, i.e. by distance
+
+After that the path from the start to any goal is found by following the parents
+back from the goal, which takes time proportional to the length of the path and
+needs no search. This is what the render uses to move the goal after a solve.
+
+Class methods:
+
+distance(goal) - The number of steps from the start to a cell, O(1)
+path(goal) - The path from the start to a cell as a list of indexes, O(path length)
+reachable(goal) - Tells if a cell can be reached from the start, O(1)
+farthest() - A cell as far from the start as any other
+histogram() - histogram()[d] is the number of cells d steps from the start
+
+The cells can be given as Nodes, (x, y) positions or flat indexes. Unlike a
+MazeIndex it only answers questions from the start, but it is built in O(V) and
+the paths are the shortest ones also in a maze with loops. If the maze is changed
+a new field must be made.
+
+"""
+
+import numpy as np
+
+from GridMaze import GridMaze
+
+
+class DistanceField:
+
+    def __init__(self, maze, start=0):
+        if not isinstance(maze, GridMaze):
+            maze = GridMaze.from_graph(maze)
+        self.maze = maze
+        self.start = maze.index(start)
+        self.fingerprint = maze.fingerprint()
+        self.order, self.parent, self.dist = maze.bfs(self.start)
+        # The parents as a list, made when first needed. Walking a list is much
+        # faster than walking the array one cell at a time
+        self._parents = None
+
+    @classmethod
+    def from_arrays(cls, maze, start, order, parent, dist, fingerprint=None):
+        """ A field found before, e.g. in another process. fingerprint is that of the
+            maze the arrays were found for (default: the maze as it is now). """
+        field = cls.__new__(cls)
+        field.maze = maze
+        field.start = maze.index(start)
+        field.fingerprint = maze.fingerprint() if fingerprint is None else fingerprint
+        field.order, field.parent, field.dist = order, parent, dist
+        field._parents = None
+        return field
+
+    def distance(self, goal) -> int:
+        return int(self.dist[self.maze.index(goal)])
+
+    def reachable(self, goal) -> bool:
+        return bool(self.dist[self.maze.index(goal)] >= 0)
+
+    def path(self, goal) -> list:
+        """ The path from the start to goal as a list of flat indexes, [] if the goal
+            can not be reached. """
+        i = self.maze.index(goal)
+        if self.dist[i] < 0:
+            return []
+        if self._parents is None:
+            self._parents = self.parent.tolist()
+        parents = self._parents
+        path = []
+        while i >= 0:
+            path.append(i)
+            i = parents[i]
+        path.reverse()
+        return path
+
+    def farthest(self) -> int:
+        # The cells are reached in order of distance
+        return int(self.order[-1])
+
+    def histogram(self) -> np.ndarray:
+        return np.bincount(self.dist[self.order])
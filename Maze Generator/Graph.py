@@ -7,10 +7,14 @@ Class variables:
 
 nodes - a set containing all nodes
 edges = A set containing edges
+outgoing - a dict giving the edges of every node, as a dict from neighbour to edge
 
 Class methods:
 
-getEdges(from) - Gives all edges going out from a node (linear complexity)
+getEdges(from) - Gives all edges going out from a node (a new set)
+get_edges2(from) - Gives all edges going out from a node (a view, nothing is copied)
+neighbors(node) - Gives all nodes connected to a node by an edge (a view)
+fingerprint() - Identifies the graph, changes whenever the graph is changed
 removeEdge(from, to) - Deletes an edge from the graph
 removeNode(node) - Deletes a node, including all its edges, from the graph
 addEdge(from, to) - Adds an edge between from and to to the graph (if not already present)
@@ -40,18 +44,33 @@ Node from
 Node to
 (double cost)
 
+The edges are undirected: an edge from a to b is equal to (and has the same hash as)
+an edge from b to a. Between two nodes there is thus at most one edge.
+
+Node and Edge use __slots__, which makes them smaller and faster to create.
+The views given by get_edges2 and neighbors change with the graph, so the graph
+must not be changed while going through them.
+
 
 """
 
-from typing import List
+from itertools import count
+
+
+# Gives every graph (and GridMaze) a number that is never reused, unlike id()
+graph_ids = count()
 
 
 class Node:
 
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value
 
     def __eq__(self, __o: object) -> bool:
+        if isinstance(__o, Node):
+            return self.value == __o.value
         return self.value == __o
 
     def __gt__(self, __o: object) -> bool:
@@ -74,13 +93,17 @@ class Node:
 
 class Edge:
 
+    __slots__ = ("fro", "to", "cost")
+
     def __init__(self, fro: Node, to: Node, cost: float=0):
         self.fro = fro
         self.to = to
         self.cost = cost
 
     def __eq__(self, __o: object) -> bool:
-        return self.fro == __o.fro and self.to == __o.to
+        # Undirected, the same edge in both directions
+        return ((self.fro == __o.fro and self.to == __o.to)
+                or (self.fro == __o.to and self.to == __o.fro))
 
     def __lt__(self, __o: object) -> bool:
         return self.cost < __o.cost
@@ -89,7 +112,8 @@ class Edge:
         return self.cost > __o.cost
 
     def __hash__(self) -> int:
-        return hash(self.fro) * 13 + hash(self.to) * 17
+        # The same in both directions, like __eq__
+        return hash(self.fro) ^ hash(self.to)
 
     def __str__(self) -> str:
         return f"(from: {self.fro}, to: {self.to}, cost: {self.cost})"
@@ -101,24 +125,31 @@ class Graph:
         self.nodes = set()
         self.edges = set()
         self.outgoing = dict()
+        self.uid = next(graph_ids)
+        # Increased on every change, see fingerprint()
+        self.version = 0
         for node in nodes:
             self.add_node(node)
-            self.outgoing[node] = []
         for edge in edges:
             self.add_edge(edge)
-            # Add to dict
-            self.outgoing[edge.fro].append(edge)
-            self.outgoing[edge.to].append(edge)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # A copy sent from another process must not share the uid of a graph made here
+        self.uid = next(graph_ids)
 
     def add_node(self, node: Node):
+        self.version += 1
         self.nodes.add(node)
         if not node in self.outgoing:
-            self.outgoing[node] = []
+            self.outgoing[node] = dict()
 
     def remove_node(self, node):
         if not node in self.nodes:
             raise KeyError("The node does not exist")
-        outgoing = self.get_edges2(node)
+        self.version += 1
+        # Copied, since the edges are removed while going through them
+        outgoing = list(self.get_edges2(node))
         for e in outgoing:
             self.remove_edge(e)
         self.nodes.remove(node)
@@ -127,33 +158,41 @@ class Graph:
     def add_edge(self, e:Edge):
         if not (e.fro in self.nodes and e.to in self.nodes):
             raise KeyError("One or both of the nodes does not exist")
+        self.version += 1
         self.edges.add(e)
         # Add to dict
-        self.outgoing[e.fro].append(e)
-        self.outgoing[e.to].append(e)
+        self.outgoing[e.fro][e.to] = e
+        self.outgoing[e.to][e.fro] = e
 
     def remove_edge(self, e:Edge):
         if not e in self.edges:
             raise KeyError("The edge does not exist")
+        self.version += 1
         self.edges.remove(e)
-        # Remove from dict
-        self.outgoing[e.fro].remove(e)
-        self.outgoing[e.to].remove(e)
+        # Remove from dict, O(1)
+        del self.outgoing[e.fro][e.to]
+        del self.outgoing[e.to][e.fro]
 
     def get_edges(self, fro:Node) -> set:
-        """ DEPRECATED. Use Node.get_edges() instead since that is faster.
-            Returns all edges going to or from a node.
-            Complexity: O(E) where E is the number of edges in the graph. """
-        edges = set()
-        if not fro in self.nodes:
+        """ DEPRECATED. Use get_edges2() instead since it does not copy the edges.
+            Returns all edges going to or from a node as a new set.
+            Complexity: O(degree) """
+        if not fro in self.outgoing:
             raise KeyError("The node does not exist")
-        for e in self.edges:
-            if e.fro == fro or e.to == fro:
-                edges.add(e)
-        return edges
+        return set(self.outgoing[fro].values())
+
+    def get_edges2(self, fro: Node):
+        """ Gives all edges going to or from a node as a view, without copying. """
+        return self.outgoing[fro].values()
+
+    def fingerprint(self) -> tuple:
+        """ Identifies the graph as it is right now. Changes whenever a node or an
+            edge is added or removed, and is never shared with another graph. """
+        return (self.uid, self.version)
 
-    def get_edges2(self, fro: Node) -> set:
-        return set(self.outgoing[fro])
+    def neighbors(self, node: Node):
+        """ Gives all nodes connected to a node by an edge as a view, without copying. """
+        return self.outgoing[node].keys()
 
 
 
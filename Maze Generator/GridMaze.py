@@ -0,0 +1,245 @@
+""" GridMaze.py """
+
+"""
+A compact representation of a maze built on a rectangular grid.
+
+Graph.py stores one Node object per cell and one Edge object per passage, which
+becomes millions of Python objects for large mazes. A GridMaze instead gives every
+cell a flat integer index
+
+    index = y * width + x
+
+and stores the walls in two NumPy boolean arrays with one entry per cell:
+
+right - right[i] is True if there is a wall between cell i and the cell to its right
+down  - down[i] is True if there is a wall between cell i and the cell below it
+
+The walls along the outer border are always present. A new GridMaze has all walls
+in place, carving passages between neighbouring cells turns it into a maze.
+
+
+Class methods:
+
+index(pos) - Gives the flat index of a Node, an (x, y) position or an index
+position(index) - Gives the (x, y) position of a flat index
+has_wall(fro, to) - Tells if there is a wall between two neighbouring cells
+carve(fro, to) - Removes the wall between two neighbouring cells
+add_wall(fro, to) - Puts back the wall between two neighbouring cells
+fingerprint() - Identifies the maze, changes whenever a wall is changed
+cell_neighbors(index) - Gives the indexes of all cells reachable in one step
+bfs(source) - Breadth-first search from a cell over the whole maze
+clip(rect) - Limits a rectangle (x0, y0, x1, y1) of cells to the maze
+region_path(a, b, rect) - The path between two cells without leaving a rectangle
+
+To be a drop-in replacement for a Graph in the Solver and render.py it also has:
+
+edges - All passages as Edge objects (created on demand, not stored)
+get_edges2(node) - All passages going out from a node as Edge objects
+neighbors(node) - All nodes reachable in one step from a node
+
+"""
+
+import numpy as np
+
+from Graph import Node, Edge, graph_ids
+
+
+class GridMaze:
+
+    def __init__(self, width: int, height: int, seed: int=None, algorithm: str=None,
+                 right=None, down=None):
+        """ Creates a maze with all walls in place, or with the given wall arrays
+            (e.g. read from a file, see mazefile.py). """
+        if width < 1 or height < 1:
+            raise ValueError("The maze must be at least 1x1")
+        self.width = width
+        self.height = height
+        # How the maze was created, if known
+        self.seed = seed
+        self.algorithm = algorithm
+        self.right = np.ones(width*height, dtype=bool) if right is None else right
+        self.down = np.ones(width*height, dtype=bool) if down is None else down
+        self.uid = next(graph_ids)
+        # Increased by carve and add_wall, see fingerprint()
+        self.version = 0
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # A copy sent from another process must not share the uid of a graph made here
+        self.uid = next(graph_ids)
+
+    @classmethod
+    def from_graph(cls, graph, width: int=None, height: int=None):
+        """ Creates a GridMaze from a Graph with (x, y) positions as node values,
+            e.g. the MST given by maze.get_maze. The size is taken from the
+            largest positions in the graph if not given. """
+        if width is None or height is None:
+            width = max(node.value[0] for node in graph.nodes) + 1
+            height = max(node.value[1] for node in graph.nodes) + 1
+        maze = cls(width, height)
+        for e in graph.edges:
+            maze.carve(e.fro, e.to)
+        return maze
+
+    def __len__(self) -> int:
+        return self.width * self.height
+
+    def __contains__(self, node) -> bool:
+        try:
+            self.index(node)
+        except KeyError:
+            return False
+        return True
+
+    def index(self, pos) -> int:
+        """ Gives the flat index of a Node, an (x, y) position or an index. """
+        if isinstance(pos, Node):
+            pos = pos.value
+        if isinstance(pos, tuple):
+            x, y = pos
+            if not (0 <= x < self.width and 0 <= y < self.height):
+                raise KeyError("The node does not exist")
+            return y*self.width + x
+        if not 0 <= pos < len(self):
+            raise KeyError("The node does not exist")
+        return int(pos)
+
+    def position(self, index: int) -> tuple:
+        return (index % self.width, index // self.width)
+
+    def _wall(self, fro, to):
+        """ Gives the wall array and the index in it for the wall between two cells. """
+        a = self.index(fro)
+        b = self.index(to)
+        if a > b:
+            a, b = b, a
+        if b == a + 1 and b % self.width != 0:
+            return self.right, a
+        if b == a + self.width:
+            return self.down, a
+        raise ValueError("The cells are not neighbours")
+
+    def has_wall(self, fro, to) -> bool:
+        walls, i = self._wall(fro, to)
+        return bool(walls[i])
+
+    def carve(self, fro, to):
+        walls, i = self._wall(fro, to)
+        walls[i] = False
+        self.version += 1
+
+    def add_wall(self, fro, to):
+        walls, i = self._wall(fro, to)
+        walls[i] = True
+        self.version += 1
+
+    def fingerprint(self) -> tuple:
+        """ Identifies the maze as it is right now. Changes whenever a wall is carved
+            or added (writing directly to the wall arrays is not noticed). """
+        return (self.uid, self.version)
+
+    def cell_neighbors(self, index: int) -> list:
+        """ Gives the indexes of all cells that can be reached from a cell in one step. """
+        width = self.width
+        x = index % width
+        neighbors = []
+        if x < width - 1 and not self.right[index]:
+            neighbors.append(index + 1)
+        if x > 0 and not self.right[index - 1]:
+            neighbors.append(index - 1)
+        if index + width < len(self) and not self.down[index]:
+            neighbors.append(index + width)
+        if index >= width and not self.down[index - width]:
+            neighbors.append(index - width)
+        return neighbors
+
+    def bfs(self, source: int) -> tuple:
+        """ Breadth-first search over the whole maze from a cell. Gives three NumPy arrays:
+            the cells in the order they were reached, the parent of every cell and the
+            number of steps from the source to every cell. The source and all cells
+            that can not be reached have parent -1, unreachable cells also distance -1.
+            Complexity: O(V), the walls are read as plain lists to keep the loop fast. """
+        width = self.width
+        size = len(self)
+        right = self.right.tolist()
+        down = self.down.tolist()
+        parent = [-1]*size
+        dist = [-1]*size
+        dist[source] = 0
+        order = [source]
+        for i in order:
+            d = dist[i] + 1
+            x = i % width
+            if x < width - 1 and not right[i] and dist[i + 1] < 0:
+                dist[i + 1] = d
+                parent[i + 1] = i
+                order.append(i + 1)
+            if x > 0 and not right[i - 1] and dist[i - 1] < 0:
+                dist[i - 1] = d
+                parent[i - 1] = i
+                order.append(i - 1)
+            if i + width < size and not down[i] and dist[i + width] < 0:
+                dist[i + width] = d
+                parent[i + width] = i
+                order.append(i + width)
+            if i >= width and not down[i - width] and dist[i - width] < 0:
+                dist[i - width] = d
+                parent[i - width] = i
+                order.append(i - width)
+        return (np.array(order, dtype=np.int32), np.array(parent, dtype=np.int32),
+                np.array(dist, dtype=np.int32))
+
+    def clip(self, rect) -> tuple:
+        """ Limits a rectangle of cells x0 <= x < x1, y0 <= y < y1, given as
+            (x0, y0, x1, y1), to the maze. """
+        x0, y0, x1, y1 = rect
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.width), min(y1, self.height)
+        if x0 >= x1 or y0 >= y1:
+            raise ValueError("The rectangle has no cells in the maze")
+        return x0, y0, x1, y1
+
+    def region_path(self, a: int, b: int, rect) -> list:
+        """ Gives the path from cell a to cell b as a list of indexes, only walking
+            through the cells in the rectangle rect (see clip). Takes time proportional
+            to the number of cells in the rectangle. """
+        x0, y0, x1, y1 = self.clip(rect)
+        width = self.width
+        parent = {a: a}
+        order = [a]
+        for i in order:
+            if i == b:
+                break
+            for n in self.cell_neighbors(i):
+                x, y = n % width, n // width
+                if not n in parent and x0 <= x < x1 and y0 <= y < y1:
+                    parent[n] = i
+                    order.append(n)
+        if not b in parent:
+            raise ValueError("The cells are not connected inside the rectangle")
+        path = [b]
+        while path[-1] != a:
+            path.append(parent[path[-1]])
+        path.reverse()
+        return path
+
+    # --- Graph interface ---
+
+    @property
+    def edges(self):
+        """ All passages as Edge objects. They are created on demand and not stored. """
+        width = self.width
+        for i in np.flatnonzero(~self.right).tolist():
+            # The right walls in the last column are the border
+            if i % width != width - 1:
+                yield Edge(Node(self.position(i)), Node(self.position(i + 1)), 1)
+        for i in np.flatnonzero(~self.down[:len(self) - width]).tolist():
+            yield Edge(Node(self.position(i)), Node(self.position(i + width)), 1)
+
+    def neighbors(self, node) -> list:
+        return [Node(self.position(i)) for i in self.cell_neighbors(self.index(node))]
+
+    def get_edges2(self, fro) -> set:
+        fro = fro if isinstance(fro, Node) else Node(self.position(self.index(fro)))
+        # All passages have the same length
+        return {Edge(fro, to, 1) for to in self.neighbors(fro)}
@@ -0,0 +1,252 @@
+""" MazeBuilder.py """
+
+"""
+Creates mazes in the background, so that a UI can keep drawing the current
+maze while a new (possibly very large) one is made.
+
+Only one maze is wanted at a time. Asking for a new maze cancels the one being made,
+since it would be thrown away anyway. Every maze is made by a MazeJob:
+
+progress - How much of the maze is done, from 0 to 1
+finished - Tells if the maze is done
+failed - Tells if the process ended without giving the maze (see worker.exitcode),
+         e.g. when it was killed for using too much memory
+cancel() - Stops the job
+
+The maze of a job is only given out when it is completely done, so the UI never
+sees a half-made maze. The UI keeps the maze it shows (the front buffer) and swaps
+it for the new one (the back buffer) between two frames.
+
+Class methods of MazeBuilder:
+
+request(width, height, seed) - Starts making a new maze, cancelling the current job
+take() - Gives the new maze once when it is done, otherwise None. A failed job is
+         forgotten, so the UI goes on with the maze it has
+busy - Tells if a maze is being made
+progress - The progress of the current job
+
+A job runs in its own process, at a lower priority than the UI. A thread would
+have to share the GIL with the UI, which makes the frames slow while the maze is
+made. On Linux the process is started with fork, which is the fastest. Elsewhere
+it is started with spawn, since e.g. on macOS forking a process that has started
+the window system is not safe. spawn imports the main script again in the new
+process, so the script must only start its UI under if __name__ == "__main__" (as
+render.py does).
+
+A FieldJob finds the distances from a cell over a whole maze (see DistanceField.py)
+in the same way, e.g. for moving the goal or showing a heatmap of a large maze. It
+also colours the heatmap (see raster.distance_colors), so the UI only has to show
+it. The arrays are large, so instead of being sent back they are written by the
+process straight into memory shared with the UI. With fork that is an anonymous
+mapping, which costs nothing until it is written, so starting a job for a maze of
+millions of cells takes a few milliseconds:
+
+field    - The DistanceField once the job is done, otherwise None
+colors   - The heatmap colours (height x width x 3) once the job is done
+finished - Tells if the job is done
+failed - Tells if the process ended without finding the field
+cancel() - Stops the job
+
+"""
+
+import ctypes
+import mmap
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+
+import numpy as np
+
+from DistanceField import DistanceField
+from maze import get_grid_maze
+from raster import distance_colors
+
+
+if sys.platform.startswith("linux"):
+    _context = multiprocessing.get_context("fork")
+else:
+    _context = multiprocessing.get_context("spawn")
+
+
+def _in_background():
+    """ Prepares the process of a job. """
+    # A forked process gets the signal handlers of the UI (pygame turns SIGTERM
+    # into a quit event), which would keep cancel() from stopping it
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+
+def _build(width, height, seed, carved, cancelled, connection):
+    """ Makes the maze of a job, in its own process. """
+    _in_background()
+
+    def progress(count):
+        carved.value = count
+        return not cancelled.is_set()
+
+    maze = get_grid_maze(width, height, seed, progress)
+    try:
+        if maze is not None:
+            connection.send(maze)
+        connection.close()
+    except OSError:
+        # The job was cancelled and nobody is listening
+        pass
+
+
+class MazeJob:
+
+    def __init__(self, width: int, height: int, seed: int=None):
+        self.width = width
+        self.height = height
+        self.seed = seed
+        self.total = max(width*height - 1, 1)
+        self.maze = None
+        self.failed = False
+        self.carved = _context.Value("q", 0, lock=False)
+        self.cancelled = _context.Event()
+        self.connection, sender = _context.Pipe(duplex=False)
+        self.worker = _context.Process(target=_build, daemon=True, args=(width, height, seed, self.carved,
+                                                                         self.cancelled, sender))
+        self.worker.start()
+        sender.close()
+
+    @property
+    def progress(self) -> float:
+        return self.carved.value / self.total
+
+    @property
+    def finished(self) -> bool:
+        # The maze is sent in one piece, only when all walls are done
+        if self.maze is None and not self.failed and not self.cancelled.is_set() and self.connection.poll():
+            try:
+                self.maze = self.connection.recv()
+            except (EOFError, OSError):
+                # The process ended without sending the maze
+                self.failed = True
+                self.connection.close()
+            self.worker.join()
+        return self.maze is not None
+
+    def cancel(self):
+        self.cancelled.set()
+        self.worker.terminate()
+        self.connection.close()
+
+
+def _shared_memory(size: int):
+    """ size bytes of memory shared with the process of a job. With fork it is an
+        anonymous mapping, which the system only fills with zeros when it is used.
+        With spawn it must be a RawArray, which is filled when it is made. """
+    if _context.get_start_method() == "fork":
+        return mmap.mmap(-1, size)
+    return _context.RawArray(ctypes.c_uint8, size)
+
+
+def _field_arrays(memory, maze) -> tuple:
+    """ The order, parent and dist arrays and the colours of a FieldJob, in its memory. """
+    size = len(maze)
+    order, parent, dist = (np.frombuffer(memory, dtype=np.int32, count=size, offset=4*size*k)
+                           for k in range(3))
+    colors = np.frombuffer(memory, dtype=np.uint8, count=3*size, offset=12*size)
+    return order, parent, dist, colors.reshape(maze.height, maze.width, 3)
+
+
+def _find_distances(maze, start, background, memory, connection):
+    """ Finds the distance field and the heatmap of a FieldJob, in its own process. """
+    _in_background()
+    field = DistanceField(maze, start)
+    order, parent, dist, colors = _field_arrays(memory, maze)
+    reached = len(field.order)
+    order[:reached] = field.order
+    parent[:] = field.parent
+    dist[:] = field.dist
+    shades, mask = distance_colors(maze, field.dist)
+    shades[~mask] = background
+    colors[:] = shades
+    try:
+        connection.send(reached)
+        connection.close()
+    except OSError:
+        # The job was cancelled and nobody is listening
+        pass
+
+
+class FieldJob:
+
+    def __init__(self, maze, start, background=(255, 255, 255)):
+        self.maze = maze
+        self.start = maze.index(start)
+        # The field is for the maze as it is now, also if it is changed before the job is done
+        self.fingerprint = maze.fingerprint()
+        self.field = None
+        self.colors = None
+        self.failed = False
+        # Three int32 arrays and the colours, 15 bytes per cell
+        self.memory = _shared_memory(15*len(maze))
+        self.connection, sender = _context.Pipe(duplex=False)
+        self.worker = _context.Process(target=_find_distances, daemon=True,
+                                       args=(maze, self.start, background, self.memory, sender))
+        self.worker.start()
+        sender.close()
+
+    @property
+    def finished(self) -> bool:
+        if self.field is None and not self.failed and self.connection.poll():
+            try:
+                reached = self.connection.recv()
+            except (EOFError, OSError):
+                # The process ended without finding the field
+                self.failed = True
+                self.connection.close()
+                self.worker.join()
+                return False
+            self.worker.join()
+            order, parent, dist, self.colors = _field_arrays(self.memory, self.maze)
+            self.field = DistanceField.from_arrays(self.maze, self.start, order[:reached],
+                                                   parent, dist, self.fingerprint)
+        return self.field is not None
+
+    def cancel(self):
+        self.worker.terminate()
+        self.connection.close()
+
+
+class MazeBuilder:
+
+    def __init__(self):
+        self.job = None
+        self.lock = threading.Lock()
+
+    def request(self, width: int, height: int, seed: int=None) -> MazeJob:
+        with self.lock:
+            if self.job is not None:
+                self.job.cancel()
+            self.job = MazeJob(width, height, seed)
+            return self.job
+
+    def take(self):
+        """ Gives the new maze if it is done, and forgets the job. Otherwise None. """
+        with self.lock:
+            if self.job is None:
+                return None
+            if not self.job.finished:
+                if self.job.failed:
+                    self.job = None
+                return None
+            maze = self.job.maze
+            self.job = None
+            return maze
+
+    @property
+    def busy(self) -> bool:
+        return self.job is not None
+
+    @property
+    def progress(self) -> float:
+        job = self.job
+        return 0 if job is None else job.progress
@@ -0,0 +1,155 @@
+""" MazeIndex.py """
+
+"""
+An index for answering path queries on a maze without searching.
+
+Every maze from get_maze is a tree, so there is exactly one path between two cells.
+If the tree is rooted somewhere, that path goes from the start up to the lowest
+common ancestor (LCA) of the start and the goal and then down to the goal.
+
+The index is built once per maze with a single breadth-first search from the root,
+giving the parent and the depth of every cell. For finding the LCA quickly it also
+keeps a binary lifting table:
+
+up[k][i] - the ancestor 2^k steps above cell i (the root is its own ancestor)
+
+Building takes O(V log V) with NumPy doing the work for the table.
+
+Class methods:
+
+lca(a, b) - The lowest common ancestor of two cells, O(log V)
+distance(start, goal) - The number of steps between two cells, O(log V)
+path(start, goal) - The path between two cells as a list of nodes, O(path length)
+repair(rect) - Updates the index after maze.recarve(index.maze, rect)
+
+The cells can be given as Nodes, (x, y) positions or flat indexes. The index only
+gives the shortest paths if the maze is a tree. If the maze is changed a new index
+must be built, except after maze.recarve which repair can follow.
+
+repair does not search the whole maze again. Every group of cells connected inside
+the carved rectangle is still entered from the root through the same cell, so only
+the cells below those entry cells get a new parent or depth. They are walked from
+the entry cells and their rows of the lifting table are recomputed with NumPy. The
+time is proportional to the number of cells below the rectangle, which is small
+when the rectangle is far from the root and at most the whole maze when it holds
+the root.
+
+"""
+
+import numpy as np
+
+from Graph import Node
+from GridMaze import GridMaze
+
+
+class MazeIndex:
+
+    def __init__(self, maze, root=0):
+        if not isinstance(maze, GridMaze):
+            maze = GridMaze.from_graph(maze)
+        self.maze = maze
+        self.root = maze.index(root)
+        _, parent, depth = maze.bfs(self.root)
+        self.parent = parent
+        self.depth = depth
+        # Cells that can not be reached from the root get themselves as ancestor
+        up = np.where(parent < 0, np.arange(len(maze), dtype=np.int32), parent)
+        self.up = [up]
+        for _ in range(max(1, int(depth.max()).bit_length()) - 1):
+            up = up[up]
+            self.up.append(up)
+
+    def repair(self, rect):
+        """ Updates the index after the rectangle rect (x0, y0, x1, y1) of the maze
+            was carved anew by maze.recarve. """
+        maze = self.maze
+        x0, y0, x1, y1 = maze.clip(rect)
+        width = maze.width
+        parent = self.parent
+        depth = self.depth
+        cells = np.array([y*width + x for y in range(y0, y1) for x in range(x0, x1)], dtype=np.int32)
+        # The cells where the path from the root enters the rectangle. The parents of the
+        # other cells in the rectangle are inside it, but may have changed
+        above = parent[cells]
+        ax, ay = above % width, above // width
+        entries = cells[(depth[cells] >= 0) & ((above < 0) | (ax < x0) | (ax >= x1) | (ay < y0) | (ay >= y1))]
+        # Walk down from the highest entry cell first, it may have others below it
+        entries = entries[np.argsort(depth[entries], kind="stable")].tolist()
+        walked_parent = dict()
+        walked_depth = dict()
+        for entry in entries:
+            if entry in walked_parent:
+                continue
+            walked_parent[entry] = int(parent[entry])
+            walked_depth[entry] = int(depth[entry])
+            stack = [entry]
+            while stack:
+                i = stack.pop()
+                for n in maze.cell_neighbors(i):
+                    if n != walked_parent[i]:
+                        walked_parent[n] = i
+                        walked_depth[n] = walked_depth[i] + 1
+                        stack.append(n)
+        changed = np.fromiter(walked_parent, dtype=np.int32, count=len(walked_parent))
+        parent[changed] = np.fromiter(walked_parent.values(), dtype=np.int32, count=len(changed))
+        depth[changed] = np.fromiter(walked_depth.values(), dtype=np.int32, count=len(changed))
+        # The ancestors of all other cells are the same as before, so every level of
+        # the table only has to be recomputed for the changed cells
+        up = self.up[0]
+        up[changed] = np.where(parent[changed] < 0, changed, parent[changed])
+        for k in range(1, len(self.up)):
+            self.up[k][changed] = self.up[k-1][self.up[k-1][changed]]
+        # The maze may have become deeper
+        deepest = int(depth[changed].max()) if len(changed) else 0
+        while len(self.up) < deepest.bit_length():
+            up = self.up[-1]
+            self.up.append(up[up])
+
+    def lca(self, a, b) -> int:
+        """ Gives the index of the lowest common ancestor of two cells. """
+        a = self.maze.index(a)
+        b = self.maze.index(b)
+        if self.depth[a] < 0 or self.depth[b] < 0:
+            raise ValueError("The nodes are not connected")
+        if self.depth[a] < self.depth[b]:
+            a, b = b, a
+        # Move a up to the same depth as b
+        diff = int(self.depth[a] - self.depth[b])
+        k = 0
+        while diff:
+            if diff & 1:
+                a = int(self.up[k][a])
+            diff >>= 1
+            k += 1
+        if a == b:
+            return a
+        # Move both up as long as they do not meet
+        for up in reversed(self.up):
+            if up[a] != up[b]:
+                a = int(up[a])
+                b = int(up[b])
+        return int(self.up[0][a])
+
+    def distance(self, start, goal) -> int:
+        """ Gives the number of steps between two cells. """
+        start = self.maze.index(start)
+        goal = self.maze.index(goal)
+        return int(self.depth[start] + self.depth[goal] - 2*self.depth[self.lca(start, goal)])
+
+    def path(self, start, goal) -> list:
+        """ Gives the path from start to goal as a list of nodes, like Solver.get_all(). """
+        start = self.maze.index(start)
+        goal = self.maze.index(goal)
+        top = self.lca(start, goal)
+        parent = self.parent
+        up = []
+        while start != top:
+            up.append(start)
+            start = int(parent[start])
+        down = []
+        while goal != top:
+            down.append(goal)
+            goal = int(parent[goal])
+        up.append(top)
+        down.reverse()
+        return [Node(self.maze.position(i)) for i in up + down]
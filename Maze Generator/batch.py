@@ -0,0 +1,119 @@
+""" batch.py """
+
+"""
+This file implements functions for doing a lot of work on mazes at once,
+spread out over several processes.
+
+solve_many(maze, pairs, mode, workers) - Solves many (start, goal) pairs on one maze
+generate_batch(count, width, height, seed, workers) - Creates many mazes
+stats_many(mazes, start, workers) - Measures many mazes (see mazestats.py)
+
+A Solver holds the state of one search, so it can not be shared. Instead every
+worker process gets its own Solver and its own copy of the maze. The maze is sent
+once to every worker when it starts, not once with every pair.
+
+Every maze in a batch gets its own seed, derived from the seed of the batch with
+NumPy's SeedSequence. A batch is therefore always the same, no matter how many
+workers are used or in what order the mazes are finished.
+
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from Graph import Node
+from maze import get_maze
+from mazefile import save_maze, load_maze
+from mazestats import maze_stats
+from solver import Solver, PathCache
+
+
+# The maze and the solver of a worker process, set once by _init_worker
+_maze = None
+_solver = None
+
+
+def _init_worker(maze):
+    global _maze, _solver
+    _maze = maze
+    # Hot pairs are often asked for more than once
+    _solver = Solver(PathCache())
+
+
+def _solve(pair):
+    start, goal, mode = pair
+    _solver.reset()
+    _solver.set(_maze, Node(start), Node(goal), mode)
+    return [node.value for node in _solver.get_all()]
+
+
+def _position(node):
+    return node.value if isinstance(node, Node) else node
+
+
+def solve_many(maze, pairs, mode="BFS", workers=None, chunksize=64):
+    """ Solves every (start, goal) pair in pairs on the maze (a Graph or a GridMaze)
+        using a pool of worker processes. Yields the paths in the same order as
+        the pairs, as soon as they are done. A path is given as a list of (x, y)
+        positions, which are much cheaper to send between processes than nodes.
+        With workers=1 everything is done in this process. """
+    pairs = ((_position(start), _position(goal), mode) for start, goal in pairs)
+    if workers == 1:
+        _init_worker(maze)
+        yield from map(_solve, pairs)
+        return
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(maze,)) as pool:
+        yield from pool.map(_solve, pairs, chunksize=chunksize)
+
+
+def _generate(index, width, height, algorithm, seed, directory):
+    maze = get_maze(width, height, algorithm, seed)
+    if directory is None:
+        return index, maze
+    path = os.path.join(directory, f"maze_{index}.maze")
+    save_maze(maze, path)
+    return index, path
+
+
+def batch_seeds(seed, count) -> list:
+    """ Gives a seed for every maze in a batch, derived from the seed of the batch. """
+    return [int(child.generate_state(1, np.uint64)[0]) for child in np.random.SeedSequence(seed).spawn(count)]
+
+
+def generate_batch(count, width, height, seed, workers=None, algorithm="kruskal", directory=None):
+    """ Creates count mazes using a pool of worker processes. Yields (index, maze)
+        as soon as a maze is done, so they do not come in order. If a directory is
+        given, every maze is instead written to a file there by the worker and
+        (index, file name) is yielded. """
+    seeds = batch_seeds(seed, count)
+    if workers == 1:
+        for index in range(count):
+            yield _generate(index, width, height, algorithm, seeds[index], directory)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(_generate, index, width, height, algorithm, seeds[index], directory)
+                   for index in range(count)]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def _stats(job):
+    maze, start = job
+    if isinstance(maze, (str, os.PathLike)):
+        maze = load_maze(maze)
+    return maze_stats(maze, start)
+
+
+def stats_many(mazes, start=0, workers=None, chunksize=1):
+    """ Measures every maze in mazes using a pool of worker processes. A maze can be
+        given as a GridMaze, a Graph or the name of a maze file, e.g. from
+        generate_batch with a directory, which is much cheaper to send to a worker.
+        Yields the MazeStats in the same order as the mazes. """
+    jobs = ((maze, start) for maze in mazes)
+    if workers == 1:
+        yield from map(_stats, jobs)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        yield from pool.map(_stats, jobs, chunksize=chunksize)
@@ -0,0 +1,227 @@
+""" bench.py """
+
+"""
+Benchmarks for generating and solving mazes of different sizes.
+
+Every benchmark is run on square mazes of the given sizes, using fixed seeds so that
+the same mazes are measured every time. For every benchmark and size it measures:
+
+seconds          - the best wall time of the repeats. Every benchmark is run at least
+                   repeat times and until it has taken MIN_SECONDS in total, so the
+                   fast ones are run often enough to not be mostly noise
+peak_bytes       - the peak memory allocated while running (measured with tracemalloc
+                   in a separate run, since tracing slows everything down)
+nodes_per_second - cells generated, or nodes visited by the solver, per second
+
+The results are written as JSON. They can be compared with an earlier run (the
+baseline), which flags every benchmark that got slower or used more memory than
+allowed by the threshold.
+
+Usage:
+
+python bench.py run --sizes 10 50 100 --out results.json
+python bench.py compare baseline.json results.json --threshold 0.2
+
+"""
+
+import argparse
+import gc
+import importlib
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from Graph import Node
+from maze import grid_to_graph, get_MST, get_maze, GENERATORS
+from solver import Solver
+
+
+SIZES = [10, 50, 100, 250, 500, 1000]
+# Every benchmark is repeated until it has taken at least this long in total
+MIN_SECONDS = 0.2
+# Imported only when first used by maze.py (NumPy) and by the DEADEND strategy
+# (DeadEndFilling), see _warm_up
+LAZY_MODULES = ["numpy", "DeadEndFilling"]
+
+
+def _warm_up():
+    """ Imports the modules that are otherwise imported inside the first benchmark
+        using them, so the import is not measured as part of it. """
+    for name in LAZY_MODULES:
+        importlib.import_module(name)
+
+
+def _solve_steps(maze, size, mode):
+    solver = Solver()
+    solver.set(maze, Node((0, 0)), Node((size-1, size-1)), mode)
+    steps = 0
+    while not solver.finished:
+        solver.next()
+        steps += 1
+    return steps
+
+def _solve_all(maze, size, mode):
+    solver = Solver()
+    solver.set(maze, Node((0, 0)), Node((size-1, size-1)), mode)
+    solver.get_all()
+    return len(solver.strategy.parent)
+
+def _solve_filled(maze, size):
+    # Dead-end filling has no parents of visited nodes, it looks at every cell
+    solver = Solver()
+    solver.set(maze, Node((0, 0)), Node((size-1, size-1)), "DEADEND")
+    solver.get_all()
+    return size*size
+
+
+def benchmarks(size, seed):
+    """ Gives (name, setup, run) for every benchmark. setup() prepares what is
+        not measured, run(prepared) is measured and gives the number of nodes. """
+    grid = [[None]*size]*size
+    cells = size*size
+    made = {}
+
+    def graph():
+        if not "graph" in made:
+            made["graph"] = grid_to_graph(grid, seed)
+        return made["graph"]
+
+    def maze():
+        if not "maze" in made:
+            made["maze"] = get_maze(size, size, seed=seed)
+        return made["maze"]
+
+    def nothing():
+        return None
+
+    def make_graph(grid):
+        grid_to_graph(grid, seed)
+        return cells
+
+    def make_mst(graph):
+        get_MST(graph)
+        return cells
+
+    def make_maze(_, algorithm="prim"):
+        get_maze(size, size, algorithm, seed)
+        return cells
+
+    yield "grid_to_graph", lambda: grid, make_graph
+    yield "get_MST", graph, make_mst
+    yield "get_maze", nothing, make_maze
+    for algorithm in GENERATORS:
+        if algorithm != "prim":
+            yield f"get_maze[{algorithm}]", nothing, lambda _, algorithm=algorithm: make_maze(_, algorithm)
+    for mode in ("BFS", "DFS"):
+        yield f"Solver[{mode}].next", maze, lambda m, mode=mode: _solve_steps(m, size, mode)
+        yield f"Solver[{mode}].get_all", maze, lambda m, mode=mode: _solve_all(m, size, mode)
+    yield "Solver[DEADEND].get_all", maze, lambda m: _solve_filled(m, size)
+
+
+def run(sizes, seed=0, repeat=3, memory=True, log=sys.stderr, min_seconds=MIN_SECONDS) -> dict:
+    _warm_up()
+    results = []
+    for size in sizes:
+        for name, setup, bench in benchmarks(size, seed):
+            prepared = setup()
+            best = None
+            runs = 0
+            total = 0
+            while runs < repeat or total < min_seconds:
+                # As in timeit, a garbage collection in the middle is not measured
+                gc.disable()
+                try:
+                    start = time.perf_counter()
+                    nodes = bench(prepared)
+                    seconds = time.perf_counter() - start
+                finally:
+                    gc.enable()
+                best = seconds if best is None else min(best, seconds)
+                runs += 1
+                total += seconds
+            peak = None
+            if memory:
+                tracemalloc.start()
+                bench(prepared)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            result = {
+                "name": name,
+                "size": size,
+                "seconds": best,
+                "peak_bytes": peak,
+                "nodes_per_second": nodes/best if best > 0 else None,
+            }
+            results.append(result)
+            print(f"{name:24} {size:5}x{size:<5} {best:10.4f} s", file=log)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "repeat": repeat,
+            "min_seconds": min_seconds,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float=0.2) -> list:
+    """ Gives a list of (name, size, metric, baseline, current) for every measurement
+        that is more than threshold (as a fraction) worse than in the baseline. """
+    old = {(r["name"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        b = old.get((r["name"], r["size"]))
+        if b is None:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            if b[metric] and r[metric] and r[metric] > b[metric]*(1 + threshold):
+                regressions.append((r["name"], r["size"], metric, b[metric], r[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for generating and solving mazes")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--repeat", type=int, default=3, help="least number of runs")
+    run_parser.add_argument("--min-seconds", type=float, default=MIN_SECONDS,
+                            help="least total time of the runs of every benchmark")
+    run_parser.add_argument("--no-memory", action="store_true", help="skip measuring memory")
+    run_parser.add_argument("--out", help="file for the JSON results (default: stdout)")
+    compare_parser = commands.add_parser("compare", help="compare results with a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run(args.sizes, args.seed, args.repeat, not args.no_memory,
+                      min_seconds=args.min_seconds)
+        if args.out:
+            with open(args.out, "w") as file:
+                json.dump(results, file, indent=2)
+        else:
+            json.dump(results, sys.stdout, indent=2)
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+    regressions = compare(baseline, current, args.threshold)
+    for name, size, metric, old, new in regressions:
+        print(f"REGRESSION {name} {size}x{size} {metric}: {old:.6g} -> {new:.6g} ({new/old - 1:+.0%})")
+    if not regressions:
+        print("No regressions")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
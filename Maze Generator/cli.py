@@ -0,0 +1,255 @@
+""" cli.py """
+
+"""
+The command line of the maze generator, run with python -m maze (or python cli.py):
+
+python -m maze generate 40 20 --algorithm wilson --seed 1
+python -m maze generate 10000 10000 --algorithm eller --format maze --out big.maze
+python -m maze generate 1000 1000 --algorithm eller --format maze --out medium.maze
+python -m maze solve 40 20 --seed 1 --start 0,0 --goal 39,19
+python -m maze solve --file medium.maze --mode BFS --format json
+python -m maze bench run --sizes 10 50
+python -m maze render 60 40
+
+Subcommands:
+
+generate - Creates a maze and writes it as text (a drawing with +, -, | and spaces),
+           as edges (one carved passage "x1 y1 x2 y2" per line) or in the binary
+           format of mazefile.py
+solve    - Finds the path between two cells of a maze, created from a size and seed
+           or loaded from a file. Writes one "x y" per line, or JSON
+bench    - Runs bench.py with the rest of the arguments
+render   - Opens the window of render.py. It always makes its mazes with get_grid_maze
+           (also when R is pressed), so it has no --algorithm
+
+The script is often run many times in a row, so nothing is imported before it is
+needed: pygame only by render, and NumPy only by what needs it. Creating a small
+maze as text or edges with one of the algorithms in plain Python (all but kruskal
+and eller) does not import NumPy at all, and small mazes are solved as a Graph for
+the same reason.
+
+The output is written as it is made, one row or edge at a time, so a large maze is
+never held as text in memory. With eller the maze itself is not held in memory
+either, since it is made one row at a time.
+
+"""
+
+import argparse
+import sys
+
+
+# Mazes up to this many cells are solved as a Graph, which does not need NumPy.
+# Larger ones are solved as a GridMaze, which is faster to create
+GRAPH_CELLS = 10_000
+
+
+def _position(text) -> tuple:
+    try:
+        x, y = (int(value) for value in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{text}' is not a position x,y") from None
+    return (x, y)
+
+
+def _seed(text) -> int:
+    # The seed must fit in the 8 bytes of a maze file (see mazefile.check_seed). It is
+    # checked here so that mazefile, and with it NumPy, is only imported when needed
+    try:
+        seed = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{text}' is not an integer") from None
+    if not 0 <= seed < 2**64:
+        raise argparse.ArgumentTypeError("the seed must be between 0 and 2^64 - 1")
+    return seed
+
+
+def _carve(width, height, algorithm, seed) -> tuple:
+    """ Creates a maze as two bytearrays of walls, like the arrays of a GridMaze,
+        without NumPy (unless the algorithm needs it). """
+    from maze import _generator
+    right = bytearray(b"\1")*(width*height)
+    down = bytearray(b"\1")*(width*height)
+    for fro, to in _generator(algorithm)(width, height, seed):
+        low = min(fro, to)
+        # As in build_maze: in a maze one cell wide the cells above and below also
+        # differ by one
+        if abs(to - fro) == width:
+            down[low] = 0
+        else:
+            right[low] = 0
+    return right, down
+
+
+def _rows(args):
+    """ Gives the walls of the maze asked for, one row at a time as (right, down). """
+    width, height = args.width, args.height
+    if args.algorithm == "eller":
+        from maze import iter_rows
+        yield from iter_rows(width, height, args.seed)
+        return
+    right, down = _carve(width, height, args.algorithm, args.seed)
+    for y in range(height):
+        yield right[y*width:(y+1)*width], down[y*width:(y+1)*width]
+
+
+def write_text(out, width, rows):
+    """ Draws a maze given one row at a time as (right, down) walls with text. """
+    out.write("+" + "--+"*width + "\n")
+    for right, down in rows:
+        out.write("|" + "".join("  |" if wall else "   " for wall in right) + "\n")
+        out.write("+" + "".join("--+" if wall else "  +" for wall in down) + "\n")
+
+
+def write_edges(out, args):
+    """ Writes every carved passage as x1 y1 x2 y2, as soon as it is carved. """
+    from maze import _generator
+    width = args.width
+    for fro, to in _generator(args.algorithm)(width, args.height, args.seed):
+        out.write(f"{fro % width} {fro // width} {to % width} {to // width}\n")
+
+
+def generate(args):
+    if args.format == "maze":
+        from mazefile import write_maze, write_rows
+        out = open(args.out, "wb") if args.out else sys.stdout.buffer
+        try:
+            if args.algorithm == "eller":
+                write_rows(out, args.width, args.height, _rows(args), args.seed, "eller")
+            else:
+                from maze import build_maze
+                write_maze(build_maze(args.width, args.height, args.algorithm, args.seed), out)
+        finally:
+            if args.out:
+                out.close()
+        return
+    out = open(args.out, "w") if args.out else sys.stdout
+    try:
+        if args.format == "edges":
+            write_edges(out, args)
+        else:
+            write_text(out, args.width, _rows(args))
+    finally:
+        if args.out:
+            out.close()
+
+
+def _open_maze(args):
+    """ Gives the maze to solve: loaded from a file, or created as a Graph or a GridMaze. """
+    if args.file:
+        from mazefile import load_maze
+        # The solver goes through the whole maze, which is slow through a mapped file
+        return load_maze(args.file, mmap=False)
+    if args.width*args.height <= GRAPH_CELLS:
+        from Graph import Graph, Node, Edge
+        from maze import _generator
+        width = args.width
+        graph = Graph()
+        for i in range(args.width*args.height):
+            graph.add_node(Node((i % width, i // width)))
+        for fro, to in _generator(args.algorithm)(width, args.height, args.seed):
+            graph.add_edge(Edge(Node((fro % width, fro // width)), Node((to % width, to // width))))
+        return graph
+    from maze import build_maze
+    return build_maze(args.width, args.height, args.algorithm, args.seed)
+
+
+def solve(args):
+    from Graph import Node
+    from solver import Solver
+    maze = _open_maze(args)
+    width, height = (maze.width, maze.height) if args.file else (args.width, args.height)
+    start = args.start or (0, 0)
+    goal = args.goal or (width - 1, height - 1)
+    for position in (start, goal):
+        if not (0 <= position[0] < width and 0 <= position[1] < height):
+            raise ValueError(f"{position} is outside the {width}x{height} maze")
+    solver = Solver()
+    solver.set(maze, Node(start), Node(goal), args.mode)
+    path = solver.get_all()
+    out = sys.stdout
+    if args.format == "json":
+        import json
+        json.dump({"path": [node.value for node in path], "length": len(path) - 1}, out)
+        out.write("\n")
+    else:
+        out.writelines(f"{node.value[0]} {node.value[1]}\n" for node in path)
+
+
+def bench(args):
+    import bench
+    return bench.main(args.arguments)
+
+
+def render(args):
+    import render
+    maze = None
+    if args.file:
+        from mazefile import load_maze
+        # The view reads whole wall arrays, which is slow through a mapped file
+        maze = load_maze(args.file, mmap=False)
+    render.main(maze, args.width or render.SIZE_X, args.height or render.SIZE_Y, args.seed)
+
+
+def _maze_arguments(parser, size_required=True, algorithm=True):
+    nargs = None if size_required else "?"
+    parser.add_argument("width", type=int, nargs=nargs)
+    parser.add_argument("height", type=int, nargs=nargs)
+    if algorithm:
+        parser.add_argument("--algorithm", default="backtracker")
+    parser.add_argument("--seed", type=_seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m maze", description="Creates and solves mazes.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = commands.add_parser("generate", help="create a maze")
+    _maze_arguments(generate_parser)
+    generate_parser.add_argument("--format", choices=["text", "edges", "maze"], default="text")
+    generate_parser.add_argument("--out", help="file to write to (default: stdout)")
+    generate_parser.set_defaults(run=generate)
+
+    solve_parser = commands.add_parser("solve", help="find the path between two cells")
+    _maze_arguments(solve_parser, size_required=False)
+    solve_parser.add_argument("--file", help="solve a maze file instead (see mazefile.py)")
+    solve_parser.add_argument("--start", type=_position, help="x,y (default: 0,0)")
+    solve_parser.add_argument("--goal", type=_position, help="x,y (default: the opposite corner)")
+    solve_parser.add_argument("--mode", default="BFS")
+    solve_parser.add_argument("--format", choices=["text", "json"], default="text")
+    solve_parser.set_defaults(run=solve)
+
+    bench_parser = commands.add_parser("bench", help="run the benchmarks of bench.py")
+    bench_parser.add_argument("arguments", nargs=argparse.REMAINDER)
+    bench_parser.set_defaults(run=bench)
+
+    render_parser = commands.add_parser("render", help="open the maze window")
+    _maze_arguments(render_parser, size_required=False, algorithm=False)
+    render_parser.add_argument("--file", help="show a maze file")
+    render_parser.set_defaults(run=render)
+
+    args = parser.parse_args(argv)
+    if args.command in ("generate", "solve", "render") and args.width is not None:
+        if args.width < 1 or args.height is None or args.height < 1:
+            parser.error("the width and height must be at least 1")
+    if args.command == "solve" and (args.file is None) == (args.width is None):
+        parser.error("solve needs either a width and height or --file")
+    if args.command in ("generate", "solve"):
+        from maze import GENERATORS
+        if not args.algorithm in GENERATORS:
+            parser.error(f"the algorithm must be one of {', '.join(GENERATORS)}")
+    try:
+        return args.run(args) or 0
+    except BrokenPipeError:
+        # The reader (e.g. head) stopped reading, which is not an error. Nothing more
+        # can be written, also not when Python flushes the output at exit
+        import os
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    except (ValueError, KeyError, OSError) as error:
+        # E.g. a maze file that is missing or is not a maze file
+        print(f"{parser.prog}: error: {error}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
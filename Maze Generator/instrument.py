@@ -0,0 +1,71 @@
+""" instrument.py """
+
+"""
+Counters for seeing where the time goes when creating or solving a maze.
+
+Counting is opt-in: get_MST, get_maze and the Solver take a stats object and only
+count when one is given, so nothing is paid when it is not used.
+
+MSTStats (get_MST, get_maze):
+pushes  - edges added to the priority queue
+pops    - edges taken from the priority queue
+skipped - popped edges with both endpoints already in the tree
+
+SolverStats (Solver):
+expanded         - nodes visited
+duplicate_pushes - nodes added to the collection again (only Dijkstra and A*,
+                   when a cheaper way to an added node is found)
+peak_frontier    - the largest size of the collection
+path_rebuilds    - times the whole path was rebuilt from the parents
+
+Both also measure the time of every phase (e.g. "grid_to_graph" and "get_MST" in
+get_maze). The times are summed in times, and if a callback is given it is called
+with the name and the seconds of every phase when it ends.
+
+"""
+
+import time
+from contextlib import contextmanager
+
+
+class Stats:
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.times = dict()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.times[name] = self.times.get(name, 0) + seconds
+            if self.callback is not None:
+                self.callback(name, seconds)
+
+    def as_dict(self) -> dict:
+        return {key: value for key, value in vars(self).items() if key != "callback"}
+
+    def __str__(self) -> str:
+        return str(self.as_dict())
+
+
+class MSTStats(Stats):
+
+    def __init__(self, callback=None):
+        super().__init__(callback)
+        self.pushes = 0
+        self.pops = 0
+        self.skipped = 0
+
+
+class SolverStats(Stats):
+
+    def __init__(self, callback=None):
+        super().__init__(callback)
+        self.expanded = 0
+        self.duplicate_pushes = 0
+        self.peak_frontier = 0
+        self.path_rebuilds = 0
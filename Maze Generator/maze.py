@@ -11,14 +11,61 @@ This article was used for reference: https://www.baeldung.com/cs/maze-generation
 Create a grid - N by M size
 Transform into a graph
 
+All functions take a seed. The same seed always gives the same maze, and no
+function uses the global random state, so mazes can be created in parallel.
+
+Besides the MST there are several other algorithms, registered by name in
+GENERATORS. Each of them works directly on the cell indexes of the grid and yields
+the edges it carves, so no weighted graph has to be built first:
+
+prim          - Prim's algorithm with random edge costs, O(E log E)
+kruskal       - Kruskal's algorithm on a random order of the edges, O(E a(V))
+eller         - Eller's algorithm, one row at a time, O(V)
+backtracker   - Depth-first search with an explicit stack, O(V)
+wilson        - Wilson's algorithm (loop-erased random walks), gives every possible
+                maze with the same probability
+hunt_and_kill - Random walks, and when stuck the first unvisited cell is connected
+                to the maze and walked from, O(V)
+
+They give mazes with different textures. The backtracker and hunt_and_kill give
+long winding corridors with few dead ends, prim and kruskal many short dead ends.
+New algorithms are added with @register_generator(name).
+
+recarve(maze, rect) carves a rectangle of an existing GridMaze anew, e.g. for a
+maze that changes while it is used. It only visits the cells in the rectangle and
+the maze stays a spanning tree. Solver.repair and MazeIndex.repair update a solved
+path and an index for the change without starting over.
+
 """
-from random import random
-from queue import PriorityQueue
+from random import Random
+from heapq import heappush, heappop
 from Graph import Graph, Node, Edge
+from instrument import MSTStats
+# NumPy and GridMaze (which needs NumPy) are imported by the functions using them, so
+# that the command line (python -m maze) starts fast when they are not needed
+
+# How often get_grid_maze reports its progress, in carved edges
+PROGRESS_EVERY = 1024
 
-def grid_to_graph(grid):
+# The algorithms by name. Every algorithm is a function (width, height, seed) yielding
+# the carved edges as (fro, to) pairs of cell indexes
+GENERATORS = dict()
+
+def register_generator(name):
+    def register(generator):
+        GENERATORS[name] = generator
+        return generator
+    return register
+
+def _generator(algorithm):
+    if not algorithm in GENERATORS:
+        raise ValueError(f"The algorithm must be one of {', '.join(GENERATORS)}")
+    return GENERATORS[algorithm]
+
+def grid_to_graph(grid, seed=None):
     """ Takes a grid and creates a graph with positions in the grid as 
         nodes and neighbours as edges and gives a random cost to every edge """
+    random = Random(seed).random
     N = len(grid)
     M = len(grid[0])
     g = Graph()
@@ -40,8 +87,9 @@ def grid_to_graph(grid):
                 g.add_edge(edge)
     return g
 
-def get_MST(graph: Graph) -> Graph:
-    """ Uses Prim's algorithm to create a minimum spanning tree. """
+def get_MST(graph: Graph, stats: MSTStats=None) -> Graph:
+    """ Uses Prim's algorithm to create a minimum spanning tree.
+        If stats is given the pushes, pops and skipped edges are counted in it. """
     # Sort all edges
     # Choose a start node
     # Add all outgoing edges to a priority queue
@@ -51,7 +99,9 @@ def get_MST(graph: Graph) -> Graph:
     # in the graph.
 
     mst = Graph()
-    pqueue = PriorityQueue()
+    # A plain heap, the thread safe queue.PriorityQueue takes a lock on every put/get
+    pqueue = []
+    count = stats is not None
 
     # Set a start node (ugly but there is no simple way to get an item from a set without removing it)
     start = next(iter(graph.nodes))
@@ -60,28 +110,430 @@ def get_MST(graph: Graph) -> Graph:
     outgoing = graph.get_edges2(start)
     # Add to PQ
     for e in outgoing:
-        pqueue.put(e)
+        heappush(pqueue, e)
+    if count:
+        stats.pushes += len(pqueue)
     
     # A MST have N-1 edges where N is the number of nodes in the tree
     while(len(mst.edges) < len(graph.nodes)-1):
-        min_edge = pqueue.get()
+        min_edge = heappop(pqueue)
+        if count:
+            stats.pops += 1
         # Test if it has more than one endpoint in mst
         if min_edge.fro in mst.nodes and min_edge.to in mst.nodes:
+            if count:
+                stats.skipped += 1
             continue
         # Add the node which is not in the mst yet
         new_node = min_edge.fro if not min_edge.fro in mst.nodes else min_edge.to
         mst.add_node(new_node)
         # The edge is part of the MST of the graph
         mst.add_edge(min_edge)
-        # Add all outgoing edges to the queue
+        # Add all outgoing edges to the queue, unless they lead back into the mst
         outgoing = graph.get_edges2(new_node)
         for e in outgoing:
-            pqueue.put(e)
+            if not (e.fro in mst.nodes and e.to in mst.nodes):
+                heappush(pqueue, e)
+                if count:
+                    stats.pushes += 1
     return mst
 
-def get_maze(width, height):
+@register_generator("prim")
+def _iter_prim(width, height, seed=None):
+    """ Prim's algorithm directly on the cell indexes of a width x height grid.
+        Yields every carved edge as a (fro, to) pair of indexes as soon as it is
+        accepted. Each edge is given its random cost when it is added to the heap,
+        and only if it leads out of the tree, so every edge is added at most once. """
+    random = Random(seed).random
+    size = width*height
+    in_tree = bytearray(size)
+    pqueue = []
+
+    def add_outgoing(i):
+        x = i % width
+        for to, ok in ((i+1, x < width-1), (i-1, x > 0), (i+width, i+width < size), (i-width, i >= width)):
+            if ok and not in_tree[to]:
+                heappush(pqueue, (random(), i, to))
+
+    in_tree[0] = 1
+    add_outgoing(0)
+    added = 1
+    while added < size:
+        _, fro, to = heappop(pqueue)
+        # Both endpoints already in the tree
+        if in_tree[to]:
+            continue
+        in_tree[to] = 1
+        added += 1
+        add_outgoing(to)
+        yield fro, to
+
+@register_generator("kruskal")
+def _iter_kruskal(width, height, seed=None):
+    """ Kruskal's algorithm on the cell indexes of a width x height grid.
+        Yields every carved edge as a (fro, to) pair of indexes.
+        Instead of giving every edge a random cost and sorting, the edges are
+        visited in the order of one random permutation, which is the same thing.
+        A union-find (disjoint set) with path compression and union by rank keeps
+        track of which cells are already connected. """
+    import numpy as np
+    size = width*height
+    cells = np.arange(size).reshape(height, width)
+    # All edges in the grid, first all horizontal and then all vertical ones
+    fro = np.concatenate((cells[:, :-1].ravel(), cells[:-1, :].ravel())).tolist()
+    to = np.concatenate((cells[:, 1:].ravel(), cells[1:, :].ravel())).tolist()
+    order = np.random.default_rng(seed).permutation(len(fro)).tolist()
+
+    parent = list(range(size))
+    rank = [0]*size
+
+    def find(i):
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        # Path compression
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    added = 1
+    for e in order:
+        # A spanning tree have N-1 edges where N is the number of nodes
+        if added == size:
+            break
+        a = find(fro[e])
+        b = find(to[e])
+        if a == b:
+            continue
+        # Union by rank
+        if rank[a] < rank[b]:
+            a, b = b, a
+        parent[b] = a
+        if rank[a] == rank[b]:
+            rank[a] += 1
+        added += 1
+        yield fro[e], to[e]
+
+def iter_rows(width, height=None, seed=None):
+    """ Uses Eller's algorithm to create a maze one row at a time. Yields the walls
+        of every row as two NumPy bool arrays (right, down) like the ones in a
+        GridMaze. Only the current row is kept in memory, so the maze can be as
+        high as wanted. Without a height the rows never end and the maze is only
+        finished by the consumer.
+        Every cell in the row belongs to a set of cells already connected by the rows
+        above. Neighbours in different sets are randomly joined, then every set
+        continues down in at least one random cell. The last row joins all sets. """
+    import numpy as np
+    random = Random(seed).random
+    # The set of every cell in the row and the cells in every set
+    sets = list(range(width))
+    members = {x: [x] for x in range(width)}
+    next_set = width
+    y = 0
+    while height is None or y < height:
+        last = y == height - 1 if height is not None else False
+        right = np.ones(width, dtype=bool)
+        for x in range(width - 1):
+            a, b = sets[x], sets[x + 1]
+            if a == b or not (last or random() < 0.5):
+                continue
+            right[x] = False
+            # Move the smaller set into the larger one
+            if len(members[a]) < len(members[b]):
+                a, b = b, a
+            for cell in members[b]:
+                sets[cell] = a
+            members[a] += members.pop(b)
+        down = np.ones(width, dtype=bool)
+        if not last:
+            for cells in members.values():
+                # At least one cell of every set continues down
+                down[cells[int(random()*len(cells))]] = False
+                for cell in cells:
+                    if random() < 0.3:
+                        down[cell] = False
+            # Cells not continuing down start new sets in the next row
+            members = {}
+            for x in range(width):
+                if down[x]:
+                    sets[x] = next_set
+                    next_set += 1
+                members.setdefault(sets[x], []).append(x)
+        yield right, down
+        y += 1
+
+@register_generator("eller")
+def _iter_eller(width, height, seed=None):
+    """ Gives the carved edges of iter_rows as (fro, to) pairs of indexes. """
+    import numpy as np
+    for y, (right, down) in enumerate(iter_rows(width, height, seed)):
+        row = y*width
+        for x in np.flatnonzero(~right).tolist():
+            yield row + x, row + x + 1
+        for x in np.flatnonzero(~down).tolist():
+            yield row + x, row + x + width
+
+def _unvisited(i, width, size, visited) -> list:
+    """ The neighbours of cell i that are not visited. """
+    x = i % width
+    cells = []
+    if x < width - 1 and not visited[i + 1]:
+        cells.append(i + 1)
+    if x > 0 and not visited[i - 1]:
+        cells.append(i - 1)
+    if i + width < size and not visited[i + width]:
+        cells.append(i + width)
+    if i >= width and not visited[i - width]:
+        cells.append(i - width)
+    return cells
+
+@register_generator("backtracker")
+def _iter_backtracker(width, height, seed=None):
+    """ The recursive backtracker (a randomized depth-first search), with an explicit
+        stack instead of recursion so there is no limit on the size of the maze.
+        Walks to a random unvisited neighbour as long as there is one, and goes back
+        along the stack when there is none. """
+    random = Random(seed).random
+    size = width*height
+    visited = bytearray(size)
+    start = int(random()*size)
+    visited[start] = 1
+    stack = [start]
+    while stack:
+        i = stack[-1]
+        cells = _unvisited(i, width, size, visited)
+        if not cells:
+            stack.pop()
+            continue
+        to = cells[int(random()*len(cells))]
+        visited[to] = 1
+        stack.append(to)
+        yield i, to
+
+@register_generator("wilson")
+def _iter_wilson(width, height, seed=None):
+    """ Wilson's algorithm. From every cell not in the maze yet a random walk is made
+        until it hits the maze. Only the last step taken out of every cell is
+        remembered, which erases the loops of the walk, and the walk is then added to
+        the maze. Gives every possible maze with the same probability (a uniform
+        spanning tree). The first walks are long, since the maze starts as one cell. """
+    random = Random(seed).random
+    size = width*height
+    in_tree = bytearray(size)
+    in_tree[int(random()*size)] = 1
+    step = [0]*size
+    for start in range(size):
+        if in_tree[start]:
+            continue
+        # Random walk until the maze is hit
+        i = start
+        while not in_tree[i]:
+            x = i % width
+            while True:
+                r = random()
+                if r < 0.25:
+                    if x < width - 1:
+                        to = i + 1
+                        break
+                elif r < 0.5:
+                    if x > 0:
+                        to = i - 1
+                        break
+                elif r < 0.75:
+                    if i + width < size:
+                        to = i + width
+                        break
+                elif i >= width:
+                    to = i - width
+                    break
+            step[i] = to
+            i = to
+        # Add the walk without its loops
+        i = start
+        while not in_tree[i]:
+            in_tree[i] = 1
+            yield i, step[i]
+            i = step[i]
+
+@register_generator("hunt_and_kill")
+def _iter_hunt_and_kill(width, height, seed=None):
+    """ Hunt-and-Kill. Walks randomly to unvisited cells like the backtracker, but
+        when stuck it does not go back. Instead it hunts for the first unvisited cell
+        (row by row) next to a visited one, connects it to a random visited neighbour
+        and walks on from there. The walk starts in the first cell, so all cells
+        before the first unvisited cell are visited. That cell thus always has a
+        visited neighbour (to the left or above) and the hunt never has to look
+        further. """
+    random = Random(seed).random
+    size = width*height
+    visited = bytearray(size)
+    i = 0
+    visited[i] = 1
+    first = 0
+    while True:
+        # Kill: walk until stuck
+        cells = _unvisited(i, width, size, visited)
+        while cells:
+            to = cells[int(random()*len(cells))]
+            visited[to] = 1
+            yield i, to
+            i = to
+            cells = _unvisited(i, width, size, visited)
+        # Hunt: the first unvisited cell
+        while first < size and visited[first]:
+            first += 1
+        if first == size:
+            return
+        i = first
+        x = i % width
+        cells = [to for to, ok in ((i - 1, x > 0), (i - width, i >= width), (i + 1, x < width - 1),
+                                   (i + width, i + width < size)) if ok and visited[to]]
+        visited[i] = 1
+        yield cells[int(random()*len(cells))], i
+
+def iter_maze(width, height, algorithm="prim", seed=None):
+    """ Creates a maze edge by edge. Every edge is yielded as soon as the algorithm
+        accepts it, so a consumer can start drawing before the maze is finished
+        or stop early. Only the frontier of the algorithm is kept in memory,
+        not the whole graph. The algorithm is any name in GENERATORS. """
+    for fro, to in _generator(algorithm)(width, height, seed):
+        yield Edge(Node((fro % width, fro // width)), Node((to % width, to // width)))
+
+def build_maze(width, height, algorithm="backtracker", seed=None) -> "GridMaze":
+    """ Creates a maze as a GridMaze with any algorithm in GENERATORS. The edges are
+        collected first and the walls of all of them are removed at once. """
+    import numpy as np
+    from GridMaze import GridMaze
+    if algorithm in FAST_BUILDERS:
+        return FAST_BUILDERS[algorithm](width, height, seed)
+    maze = GridMaze(width, height, seed, algorithm)
+    carved = np.array(list(_generator(algorithm)(width, height, seed)), dtype=np.int64).reshape(-1, 2)
+    # The edges can go in any direction, the wall belongs to the smaller index
+    low = carved.min(axis=1)
+    vertical = np.abs(carved[:, 1] - carved[:, 0]) == width
+    maze.right[low[~vertical]] = False
+    maze.down[low[vertical]] = False
+    return maze
+
+def get_kruskal_maze(width, height, seed=None) -> "GridMaze":
+    """ Uses Kruskal's algorithm to create a spanning tree of the grid as a GridMaze.
+        The walls of all carved edges are removed at once. """
+    return build_maze(width, height, "kruskal", seed)
+
+def get_eller_maze(width, height, seed=None) -> "GridMaze":
+    """ Fills a GridMaze with the rows given by iter_rows. """
+    from GridMaze import GridMaze
+    maze = GridMaze(width, height, seed, "eller")
+    for y, (right, down) in enumerate(iter_rows(width, height, seed)):
+        maze.right[y*width:(y+1)*width] = right
+        maze.down[y*width:(y+1)*width] = down
+    return maze
+
+# Algorithms that can fill a GridMaze faster than by carving their edges one by one
+FAST_BUILDERS = {"eller": get_eller_maze}
+
+def get_maze(width, height, algorithm="prim", seed=None, stats: MSTStats=None):
     """ Combines functions grid_to_graph and get_mst to a nice, 
-        easy to read function for creating MST to be used as mazes. """
+        easy to read function for creating MST to be used as mazes.
+        With any other algorithm in GENERATORS the maze is instead created by
+        build_maze and given as a GridMaze, which can be used the same way as
+        the Graph.
+        If stats is given the time of every phase is measured in it. """
+    if algorithm != "prim":
+        _generator(algorithm)
+        if stats is None:
+            return build_maze(width, height, algorithm, seed)
+        with stats.phase("build_maze"):
+            return build_maze(width, height, algorithm, seed)
     # What type the elements have is arbitrary, only indexes are of interest
     grid = [[None]*height]*width
-    return get_MST(grid_to_graph(grid))
+    if stats is None:
+        return get_MST(grid_to_graph(grid, seed))
+    with stats.phase("grid_to_graph"):
+        graph = grid_to_graph(grid, seed)
+    with stats.phase("get_MST"):
+        return get_MST(graph, stats)
+
+def get_grid_maze(width, height, seed=None, progress=None) -> "GridMaze":
+    """ Uses Prim's algorithm directly on the cell indexes of a GridMaze, without
+        creating the intermediate Graph. Gives the same kind of maze as get_maze
+        but uses a fraction of the memory.
+        If progress is given it is called with the number of carved edges every
+        PROGRESS_EVERY edges. If it returns False the maze is given up and None
+        is returned. """
+    from GridMaze import GridMaze
+    maze = GridMaze(width, height, seed, "prim")
+    if progress is None:
+        for fro, to in _iter_prim(width, height, seed):
+            maze.carve(fro, to)
+        return maze
+    for carved, (fro, to) in enumerate(_iter_prim(width, height, seed), 1):
+        maze.carve(fro, to)
+        if carved % PROGRESS_EVERY == 0 and progress(carved) is False:
+            return None
+    return maze
+
+def recarve(maze: "GridMaze", rect, seed=None) -> tuple:
+    """ Carves the cells in a rectangle (x0, y0, x1, y1) of a GridMaze anew, leaving
+        the rest of the maze as it is. Only the cells in the rectangle are visited,
+        so it takes time proportional to the size of the rectangle, not the maze.
+
+        The passages inside the rectangle split its cells into groups that are
+        connected inside it. Every group is connected to the others through the
+        rest of the maze, so each group gets a new random spanning tree of its own
+        cells (Kruskal's algorithm) and no passage is carved between two groups.
+        The maze stays a spanning tree and every cell can still be reached.
+
+        Gives the removed and the added passages as lists of (fro, to) pairs of
+        indexes, with fro the smaller index. """
+    x0, y0, x1, y1 = maze.clip(rect)
+    width = maze.width
+    cells = [y*width + x for y in range(y0, y1) for x in range(x0, x1)]
+    # All pairs of neighbours inside the rectangle, first the horizontal then the vertical ones
+    pairs = [(i, i + 1) for i in cells if i % width < x1 - 1]
+    pairs += [(i, i + width) for i in cells if i // width < y1 - 1]
+
+    def walls(pair):
+        return maze.right if pair[1] == pair[0] + 1 else maze.down
+
+    parent = {i: i for i in cells}
+
+    def find(i):
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        # Path compression
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    old = [pair for pair in pairs if not walls(pair)[pair[0]]]
+    for a, b in old:
+        parent[find(a)] = find(b)
+    group = {i: find(i) for i in cells}
+
+    for pair in old:
+        walls(pair)[pair[0]] = True
+    parent = {i: i for i in cells}
+    Random(seed).shuffle(pairs)
+    new = []
+    for pair in pairs:
+        a, b = pair
+        if group[a] != group[b]:
+            continue
+        a = find(a)
+        b = find(b)
+        if a != b:
+            parent[a] = b
+            walls(pair)[pair[0]] = False
+            new.append(pair)
+    # The walls were written directly, so the change must be noted for fingerprint()
+    maze.version += 1
+    kept = set(old) & set(new)
+    return [pair for pair in old if not pair in kept], [pair for pair in new if not pair in kept]
+
+if __name__ == "__main__":
+    # The command line, see cli.py
+    import sys
+    from cli import main
+    sys.exit(main())
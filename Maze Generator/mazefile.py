@@ -0,0 +1,235 @@
+""" mazefile.py """
+
+"""
+This file implements saving and loading of mazes in a compact binary format.
+
+The file starts with a header of 40 bytes (all numbers little-endian):
+
+magic     - 4 bytes, b"MAZE"
+version   - 2 bytes, the version of the format (FORMAT_VERSION)
+flags     - 2 bytes, bit 0 is set if the seed is known
+width     - 4 bytes
+height    - 4 bytes
+seed      - 8 bytes, unsigned
+algorithm - 16 bytes, ASCII padded with zeros
+
+After the header come the walls, one record per row of the maze. A record holds the
+right walls of the row followed by the walls below the row, each packed as bits into
+ceil(width/8) bytes (the first cell in the highest bit of the first byte). That is
+about 2 bits per cell, and every row starts at a known offset so the file can be
+written one row at a time.
+
+load_maze maps the file into memory with mmap instead of reading it. The walls are
+then read through PackedBits, which only touches the parts of the file that are
+used: single walls, or the rows of a slice. That makes opening a large maze and
+looking at a part of it cheap, and a maze can be copied to another file (e.g. with
+write_maze) a chunk of rows at a time. Solving or measuring a maze still needs the
+whole maze in memory: GridMaze.bfs unpacks all walls into lists, and the Solver
+keeps a Node for every cell it visits. Reading many single walls through the
+mapping is also slower than reading them from an unpacked array, so for that the
+maze is better loaded with mmap=False.
+
+save_rows writes a maze that is given one row at a time, e.g. by maze.iter_rows,
+so a maze can be created and saved without ever being held in memory. write_rows
+does the same to a pipe, e.g. the standard output.
+
+dumps_maze and loads_maze do the same as save_maze and load_maze with bytes instead
+of a file, e.g. for sending a maze to another process or over a socket.
+
+The seed must fit in its 8 bytes. Every writer raises a ValueError for a seed that
+does not, and check_seed lets a caller find out before making the maze.
+
+"""
+
+import io
+import struct
+
+import numpy as np
+
+from GridMaze import GridMaze
+
+
+MAGIC = b"MAZE"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHIIQ16s")
+FLAG_SEED = 1
+# Number of rows packed and written at a time
+CHUNK_ROWS = 4096
+
+
+class PackedBits:
+    """ Wall bits stored packed in rows of whole bytes, that can be used in place of
+        the NumPy bool arrays of a GridMaze. Single bits are read and written directly,
+        and a slice only unpacks the rows it covers. Anything else (including tolist)
+        unpacks all the bits into a normal array first. """
+
+    def __init__(self, rows, width: int):
+        self.rows = rows
+        self.width = width
+
+    def __len__(self) -> int:
+        return self.rows.shape[0] * self.width
+
+    def __getitem__(self, i):
+        if isinstance(i, (int, np.integer)):
+            y, x = divmod(int(i), self.width)
+            return bool((self.rows[y, x >> 3] >> (7 - (x & 7))) & 1)
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step > 0:
+                if start >= stop:
+                    return np.zeros(0, dtype=bool)
+                first = start // self.width
+                last = (stop - 1) // self.width + 1
+                bits = self._unpack(first, last)
+                offset = first*self.width
+                return bits[start - offset:stop - offset:step]
+        return np.asarray(self)[i]
+
+    def __setitem__(self, i, value):
+        if not isinstance(i, (int, np.integer)):
+            raise TypeError("Only single bits can be changed")
+        y, x = divmod(int(i), self.width)
+        bit = 1 << (7 - (x & 7))
+        if value:
+            self.rows[y, x >> 3] |= bit
+        else:
+            self.rows[y, x >> 3] &= ~bit & 0xFF
+
+    def _unpack(self, first, last) -> np.ndarray:
+        """ The bits of the rows first <= y < last as a flat bool array. """
+        return np.unpackbits(self.rows[first:last], axis=1, count=self.width).astype(bool).ravel()
+
+    def __array__(self, dtype=None, copy=None):
+        bits = self._unpack(0, self.rows.shape[0])
+        return bits if dtype is None else bits.astype(dtype)
+
+    def __invert__(self):
+        return ~np.asarray(self)
+
+    def tolist(self) -> list:
+        return np.asarray(self).tolist()
+
+
+def _row_bytes(width: int) -> int:
+    return (width + 7) // 8
+
+
+def check_seed(seed):
+    """ Raises a ValueError if seed can not be stored in a maze file. """
+    if seed is not None and not 0 <= seed < 2**64:
+        raise ValueError("The seed must be between 0 and 2^64 - 1")
+
+
+def write_header(file, width, height, seed=None, algorithm=None):
+    check_seed(seed)
+    flags = 0 if seed is None else FLAG_SEED
+    name = (algorithm or "").encode("ascii")
+    if len(name) > 16:
+        raise ValueError("The name of the algorithm is too long")
+    file.write(HEADER.pack(MAGIC, FORMAT_VERSION, flags, width, height, seed or 0, name))
+
+
+def read_header(file) -> tuple:
+    """ Gives (width, height, seed, algorithm) of an open maze file. """
+    data = file.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError("Not a maze file")
+    magic, version, flags, width, height, seed, name = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise ValueError("Not a maze file")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported maze file version {version}")
+    seed = seed if flags & FLAG_SEED else None
+    algorithm = name.rstrip(b"\0").decode("ascii") or None
+    return width, height, seed, algorithm
+
+
+def save_maze(maze, path):
+    """ Saves a maze (a GridMaze, or a Graph from get_maze) to a file. """
+    with open(path, "wb") as file:
+        write_maze(maze, file)
+
+
+def write_maze(maze, file):
+    """ Writes a maze (a GridMaze, or a Graph from get_maze) to an open binary file. """
+    if not isinstance(maze, GridMaze):
+        maze = GridMaze.from_graph(maze)
+    width = maze.width
+    write_header(file, width, maze.height, maze.seed, maze.algorithm)
+    for y in range(0, maze.height, CHUNK_ROWS):
+        cells = slice(y*width, min(y + CHUNK_ROWS, maze.height)*width)
+        right = np.packbits(np.asarray(maze.right[cells]).reshape(-1, width), axis=1)
+        down = np.packbits(np.asarray(maze.down[cells]).reshape(-1, width), axis=1)
+        # Not tofile, so that any file object can be written to
+        file.write(np.stack((right, down), axis=1).tobytes())
+
+
+def dumps_maze(maze) -> bytes:
+    """ Gives a maze in the same format as save_maze writes to a file. """
+    file = io.BytesIO()
+    write_maze(maze, file)
+    return file.getvalue()
+
+
+def loads_maze(data) -> GridMaze:
+    """ Gives the maze in bytes from dumps_maze. """
+    width, height, seed, algorithm = read_header(io.BytesIO(data[:HEADER.size]))
+    shape = (height, 2, _row_bytes(width))
+    records = np.frombuffer(data, dtype=np.uint8, count=int(np.prod(shape)), offset=HEADER.size)
+    records = records.reshape(shape)
+    right = np.asarray(PackedBits(records[:, 0, :], width))
+    down = np.asarray(PackedBits(records[:, 1, :], width))
+    return GridMaze(width, height, seed, algorithm, right, down)
+
+
+def _write_rows(file, rows) -> int:
+    height = 0
+    for right, down in rows:
+        file.write(np.packbits(np.asarray(right, dtype=bool)).tobytes())
+        file.write(np.packbits(np.asarray(down, dtype=bool)).tobytes())
+        height += 1
+    return height
+
+
+def save_rows(path, width, rows, seed=None, algorithm=None) -> int:
+    """ Saves a maze given one row at a time as (right, down) wall arrays, e.g. from
+        maze.iter_rows, without ever holding more than one row in memory. The height
+        is not needed in advance, it is written to the header when all rows are
+        done. Gives the number of rows written. """
+    with open(path, "wb") as file:
+        write_header(file, width, 0, seed, algorithm)
+        height = _write_rows(file, rows)
+        file.seek(0)
+        write_header(file, width, height, seed, algorithm)
+    return height
+
+
+def write_rows(file, width, height, rows, seed=None, algorithm=None):
+    """ Like save_rows, but for a maze of known height written to an open binary file
+        that can not be rewound, e.g. a pipe. """
+    write_header(file, width, height, seed, algorithm)
+    if _write_rows(file, rows) != height:
+        raise ValueError("The number of rows is not the height")
+
+
+def load_maze(path, mmap=True, writable=False) -> GridMaze:
+    """ Loads a maze saved by save_maze. With mmap the file is mapped into memory
+        and only read where it is used, otherwise it is read and unpacked at once,
+        which is faster if the whole maze is used (e.g. solving it). A writable
+        mapped maze writes carved walls straight back to the file. """
+    with open(path, "rb") as file:
+        width, height, seed, algorithm = read_header(file)
+        if not mmap:
+            records = np.fromfile(file, dtype=np.uint8, count=height*2*_row_bytes(width))
+    shape = (height, 2, _row_bytes(width))
+    if mmap:
+        records = np.memmap(path, dtype=np.uint8, mode="r+" if writable else "r",
+                            offset=HEADER.size, shape=shape)
+        right = PackedBits(records[:, 0, :], width)
+        down = PackedBits(records[:, 1, :], width)
+    else:
+        records = records.reshape(shape)
+        right = np.asarray(PackedBits(records[:, 0, :], width))
+        down = np.asarray(PackedBits(records[:, 1, :], width))
+    return GridMaze(width, height, seed, algorithm, right, down)
@@ -0,0 +1,103 @@
+""" mazestats.py """
+
+"""
+Measures how hard a maze is, without solving it from many places.
+
+Every maze from get_maze is a tree, which makes all of these possible in O(V):
+
+dead_ends      - cells with one way out
+junctions      - cells with three or four ways out
+corridor_cells - cells with exactly two ways out
+corridors      - the paths between two cells that are not corridor cells (dead ends
+                 and junctions), i.e. the edges of the tree if every corridor is
+                 shortened to a single step
+mean_corridor  - the mean length of a corridor in steps
+max_corridor   - the length of the longest corridor in steps
+diameter       - the longest shortest path in the maze, in steps
+diameter_ends  - the two cells at the ends of that path
+distances      - distances[d] is the number of cells d steps from the start
+mean_distance  - the mean distance from the start to a cell
+
+The number of ways out of every cell (its degree) is counted with NumPy from the wall
+arrays. The diameter of a tree is found with two breadth-first searches: the cell
+farthest from any cell is one end of a longest path, and the cell farthest from that
+one is the other end. The first search is a DistanceField from the start, so it also
+gives the distances from the start. The corridors are measured along the second search.
+
+Only the cells that can be reached from the start are measured.
+
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from DistanceField import DistanceField
+from GridMaze import GridMaze
+
+
+MazeStats = namedtuple("MazeStats", ["cells", "dead_ends", "junctions", "corridor_cells",
+                                     "corridors", "mean_corridor", "max_corridor",
+                                     "diameter", "diameter_ends", "start", "distances",
+                                     "mean_distance"])
+
+
+def degrees(maze) -> np.ndarray:
+    """ The number of ways out of every cell, as a flat array. """
+    right = ~np.asarray(maze.right)
+    down = ~np.asarray(maze.down)
+    degree = right.astype(np.int8) + down
+    # The border walls are always there, so the wall to the right of the last cell
+    # of a row never opens into the first cell of the next row
+    degree[1:] += right[:-1]
+    degree[maze.width:] += down[:-maze.width]
+    return degree
+
+
+def corridor_lengths(order, parent, dist, degree) -> np.ndarray:
+    """ The length of every corridor, given a breadth-first search from a cell that
+        is not a corridor cell. Every cell that is not a corridor cell ends the
+        corridor going up from it towards the root. """
+    corridor = (degree == 2).tolist()
+    parent_list = parent.tolist()
+    # The closest cell above every cell that is not a corridor cell
+    top = [0]*len(parent_list)
+    for i in order[1:].tolist():
+        p = parent_list[i]
+        top[i] = top[p] if corridor[p] else p
+    ends = order[1:][degree[order[1:]] != 2]
+    return dist[ends] - dist[np.array(top, dtype=np.int32)[ends]]
+
+
+def maze_stats(maze, start=0) -> MazeStats:
+    """ Measures a maze (a GridMaze or a Graph from get_maze). The start can be
+        given as a Node, an (x, y) position or an index. """
+    if not isinstance(maze, GridMaze):
+        maze = GridMaze.from_graph(maze)
+    start = maze.index(start)
+    field = DistanceField(maze, start)
+    distances = field.histogram()
+    # The farthest cell from the start is one end of a longest path
+    first = field.farthest()
+    field = DistanceField(maze, first)
+    second = field.farthest()
+    order, parent, dist = field.order, field.parent, field.dist
+
+    degree = degrees(maze)
+    lengths = corridor_lengths(order, parent, dist, degree)
+    degree = degree[order]
+
+    return MazeStats(
+        cells=len(order),
+        dead_ends=int(np.count_nonzero(degree == 1)),
+        junctions=int(np.count_nonzero(degree >= 3)),
+        corridor_cells=int(np.count_nonzero(degree == 2)),
+        corridors=len(lengths),
+        mean_corridor=float(lengths.mean()) if len(lengths) else 0.0,
+        max_corridor=int(lengths.max()) if len(lengths) else 0,
+        diameter=int(dist[second]),
+        diameter_ends=(maze.position(first), maze.position(second)),
+        start=maze.position(start),
+        distances=distances,
+        mean_distance=float(np.arange(len(distances)) @ distances / distances.sum()),
+    )
@@ -0,0 +1,194 @@
+""" raster.py """
+
+"""
+This file renders mazes to images without pygame, e.g. on a server.
+
+Instead of drawing every wall with its own line like render.py, the whole maze is
+drawn into a NumPy pixel array at once using the wall arrays of a GridMaze:
+
+1. Colour the cells (optional, e.g. by the distance from the start or in the
+   order a solver visited them)
+2. Draw all walls: every wall is repeated block_size times along its side and
+   written into every block_size:th row and column of the image
+3. Draw the path (optional) as straight segments between the cell centers
+
+Every step is a handful of NumPy operations, no matter how large the maze is.
+The image has width*block_size+1 x height*block_size+1 pixels and can be saved as
+PNG or PPM without any other libraries.
+
+"""
+
+import struct
+import zlib
+
+import numpy as np
+
+from GridMaze import GridMaze
+
+
+C_CANVAS  = (255, 255, 255)
+C_LINE    = (0, 0, 0)
+C_PATH    = (0, 0, 255)
+C_VISITED = (255, 200, 120)
+# The distance heatmap goes from C_NEAR at the start to C_FAR at the farthest cell
+C_NEAR    = (255, 245, 170)
+C_FAR     = (170, 20, 40)
+
+
+def _indexes(maze, cells) -> np.ndarray:
+    """ Gives the flat indexes of cells given as Nodes, (x, y) positions or indexes. """
+    return np.array([maze.index(cell) for cell in cells], dtype=np.int64)
+
+
+def fill_cells(image, colors, mask, block_size):
+    """ Colours the cells where mask (height x width) is True with colors
+        (height x width x 3). The walls are drawn on top afterwards. """
+    height, width = mask.shape
+    size = block_size
+    pixels = np.repeat(np.repeat(colors, size, axis=0), size, axis=1)
+    covered = np.repeat(np.repeat(mask, size, axis=0), size, axis=1)
+    area = image[:height*size, :width*size]
+    area[covered] = pixels[covered]
+
+
+def wall_window(maze, x0, y0, x1, y1) -> tuple:
+    """ Gives the walls of the cells x0 <= x < x1, y0 <= y < y1 as two bool arrays:
+        the walls to the left of every cell and after the last column (height x
+        width+1), and the walls above every cell and below the last row (height+1 x
+        width). Outside the maze there is always a wall. """
+    right = np.asarray(maze.right).reshape(maze.height, maze.width)
+    down = np.asarray(maze.down).reshape(maze.height, maze.width)
+    vertical = np.ones((y1 - y0, x1 - x0 + 1), dtype=bool)
+    vertical[:, 1:] = right[y0:y1, x0:x1]
+    if x0 > 0:
+        vertical[:, 0] = right[y0:y1, x0-1]
+    horizontal = np.ones((y1 - y0 + 1, x1 - x0), dtype=bool)
+    horizontal[1:, :] = down[y0:y1, x0:x1]
+    if y0 > 0:
+        horizontal[0, :] = down[y0-1, x0:x1]
+    return vertical, horizontal
+
+
+def draw_wall_arrays(image, vertical, horizontal, block_size, color=C_LINE):
+    """ Draws walls given as by wall_window, with the first cell in the top left
+        corner of the image. """
+    height, width, size = vertical.shape[0], horizontal.shape[1], block_size
+    walls = np.zeros(image.shape[:2], dtype=bool)
+    walls[:height*size, :(width + 1)*size:size] |= np.repeat(vertical, size, axis=0)
+    walls[:(height + 1)*size:size, :width*size] |= np.repeat(horizontal, size, axis=1)
+    # The corners are always drawn
+    walls[:(height + 1)*size:size, :(width + 1)*size:size] = True
+    image[walls] = color
+
+
+def draw_walls(image, maze, block_size, color=C_LINE):
+    vertical, horizontal = wall_window(maze, 0, 0, maze.width, maze.height)
+    draw_wall_arrays(image, vertical, horizontal, block_size, color)
+
+
+def draw_path(image, maze, path, block_size, color=C_PATH, thickness=None):
+    """ Draws the path as straight segments between the centers of its cells. """
+    if len(path) < 2:
+        return
+    size = block_size
+    thickness = thickness or max(1, size // 4)
+    cells = _indexes(maze, path)
+    x = cells % maze.width * size + size // 2
+    y = cells // maze.width * size + size // 2
+    # Every segment starts at the smaller center and is size pixels long
+    x0 = np.minimum(x[:-1], x[1:])
+    y0 = np.minimum(y[:-1], y[1:])
+    along = np.arange(size + 1)
+    across = np.arange(thickness) - thickness // 2
+    flat = y[:-1] == y[1:]
+    # Horizontal segments
+    rows = y0[flat, None, None] + across[None, :, None]
+    cols = x0[flat, None, None] + along[None, None, :]
+    image[np.broadcast_to(rows, (rows.shape[0], thickness, size + 1)),
+          np.broadcast_to(cols, (cols.shape[0], thickness, size + 1))] = color
+    # Vertical segments
+    rows = y0[~flat, None, None] + along[None, None, :]
+    cols = x0[~flat, None, None] + across[None, :, None]
+    image[np.broadcast_to(rows, (rows.shape[0], thickness, size + 1)),
+          np.broadcast_to(cols, (cols.shape[0], thickness, size + 1))] = color
+
+
+def visit_colors(maze, visited, color=C_VISITED) -> tuple:
+    """ Gives colours and a mask for the cells in visited, getting darker the
+        later they were visited. """
+    cells = _indexes(maze, visited)
+    shade = np.zeros(len(maze))
+    shade[cells] = np.linspace(0, 0.6, len(cells)) if len(cells) else []
+    colors = np.array(color, dtype=float)[None, :] * (1 - shade[:, None])
+    mask = np.zeros(len(maze), dtype=bool)
+    mask[cells] = True
+    shape = (maze.height, maze.width)
+    return colors.astype(np.uint8).reshape(shape + (3,)), mask.reshape(shape)
+
+
+def distance_colors(maze, dist, near=C_NEAR, far=C_FAR) -> tuple:
+    """ Gives colours and a mask for a heatmap of the distances dist (a flat array
+        with -1 for cells that can not be reached, e.g. DistanceField.dist). """
+    dist = np.asarray(dist)
+    mask = dist >= 0
+    # Single precision is plenty for a colour and halves the memory of large mazes
+    shade = dist.astype(np.float32) / max(int(dist.max()), 1)
+    near = np.array(near, dtype=np.float32)
+    far = np.array(far, dtype=np.float32)
+    colors = near[None, :] + (far - near)[None, :] * shade[:, None]
+    shape = (maze.height, maze.width)
+    return colors.astype(np.uint8).reshape(shape + (3,)), mask.reshape(shape)
+
+
+def rasterize(maze, block_size=4, path=None, visited=None, distances=None) -> np.ndarray:
+    """ Draws a maze (a GridMaze or a Graph from get_maze) as an RGB image.
+        path and visited are lists of cells (Nodes, (x, y) positions or indexes),
+        e.g. from Solver.get_all() and the order the solver visited the nodes.
+        distances is drawn as a heatmap, see distance_colors. """
+    if block_size < 2:
+        raise ValueError("The block size must be at least 2 to fit the walls")
+    if not isinstance(maze, GridMaze):
+        maze = GridMaze.from_graph(maze)
+    size = block_size
+    image = np.empty((maze.height*size + 1, maze.width*size + 1, 3), dtype=np.uint8)
+    image[:] = C_CANVAS
+    if distances is not None:
+        fill_cells(image, *distance_colors(maze, distances), size)
+    if visited is not None:
+        fill_cells(image, *visit_colors(maze, visited), size)
+    draw_walls(image, maze, size)
+    if path is not None:
+        draw_path(image, maze, path, size)
+    return image
+
+
+def write_ppm(image, path):
+    height, width, _ = image.shape
+    with open(path, "wb") as file:
+        file.write(f"P6 {width} {height} 255\n".encode("ascii"))
+        file.write(np.ascontiguousarray(image, dtype=np.uint8).tobytes())
+
+
+def write_png(image, path, level=6):
+    height, width, _ = image.shape
+    # Every row starts with the filter type, 0 (none)
+    rows = np.zeros((height, width*3 + 1), dtype=np.uint8)
+    rows[:, 1:] = image.reshape(height, width*3)
+
+    def chunk(kind, data):
+        return (struct.pack(">I", len(data)) + kind + data
+                + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    with open(path, "wb") as file:
+        file.write(b"\x89PNG\r\n\x1a\n")
+        file.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        file.write(chunk(b"IDAT", zlib.compress(rows.tobytes(), level)))
+        file.write(chunk(b"IEND", b""))
+
+
+def save_image(image, path):
+    """ Saves an image as PNG, or as PPM if the file name ends with .ppm. """
+    if str(path).lower().endswith(".ppm"):
+        write_ppm(image, path)
+    else:
+        write_png(image, path)
@@ -9,38 +9,71 @@ and will be drawn as such. Pygame is used for rendering.
 
 Idea:
 
-To iterate through all edges every time to see if it's present would be inefficient.
-Instead, create a map/dict with nodes as keys and all connecting edges as a set of values.
-Then it's sufficient to iterate through all edges once, add to each node's set.
-Complexity is thus O(E)*O(log V) = O(E log V) for E edges and V nodes.
-Since the graph is a MST, E = V-1, giving a complexity of O(V log V).
-
-get a MST with size size_x * size_y
-Create a map with nodes as keys and outgoing edges as values.
-
-To "remove" a wall is the same as adding it - but drawing a line with the background color
-instead of the wall color where it should be. A possible approach would then be:
-1. Draw a grid
-2. Iterate through all edges. Remove (or add opening, same same) the wall the edge represents.
-3. Done
-
-Complexity becomes linear O(E) = O(V-1) for removing all walls that should be removed.
+The maze is a GridMaze (see GridMaze.py), with its walls in two arrays: the wall to
+the right of every cell and the wall below every cell. Instead of drawing a grid and
+then erasing the wall of every passage, all walls of a part of the maze are drawn at
+once with NumPy from those arrays (see raster.py), which is linear in the number of
+cells drawn.
+
+Since the maze does not change between frames it is only drawn once per maze, into
+maze_surface. Every frame after that only the cells that changed (the part of the path
+given by the solver, moved start or goal) are restored from maze_surface, redrawn and
+sent to the display. The cost of a frame is thus proportional to what changed, not
+to the size of the maze.
+
+The canvas is a view (a camera) of the maze, that can be zoomed and moved. Only the
+cells inside the view are drawn: which cells are visible follows directly from the
+position of the camera since the maze is a grid, and their walls are read from the
+wall arrays of the GridMaze and drawn at once with NumPy (see raster.py). The path is
+kept in tiles of TILE x TILE cells, so the visible part of a long path is found
+without going through all of it. The cost of drawing the view thus depends on the
+size of the window, not on the size of the maze.
+
+New mazes (R and UP) are made in a background process by a MazeBuilder, while the
+current maze is still shown and can be solved. A bar shows how far it has come, and
+the new maze is swapped in between two frames when it is done. Asking for another
+maze before that cancels the one being made.
+
+C carves the cells around the mouse anew with recarve (see maze.py). The path and
+the index used for moving start and goal are mended for the change instead of being
+found again.
+
+After a solve the goal is moved with a DistanceField from the start (see
+DistanceField.py): one breadth-first search gives the distance and the parent of
+every cell, so the path to the new goal is just the parents walked back from it.
+H shows the same distances as a heatmap under the walls. The heatmap is made once
+per field as a surface with one pixel per cell, and only its visible part is
+scaled up when the view is drawn.
+
+For mazes larger than FIELD_CELLS the search would take longer than a frame, so the
+field and the colours of the heatmap are made in the background by a FieldJob (see
+MazeBuilder.py), and a new start or change of the maze starts a new one. Until it
+is done the path that was shown before is kept, and the heatmap of the previous
+start is shown (if the maze is the same). Moving the start of a large maze also
+waits for its field, since a MazeIndex would take as long to build on the UI thread.
 
 """
 # Standard libraries
 import math
+from collections import defaultdict
 
 # External libraries
+import numpy as np
 import pygame
 
 # Internal libraries
-from Graph import Graph, Node
-from maze import get_maze
+from Graph import Node
+from maze import get_grid_maze, recarve
 from solver import Solver
+from MazeIndex import MazeIndex
+from DistanceField import DistanceField
+from MazeBuilder import MazeBuilder, FieldJob
+from raster import wall_window, draw_wall_arrays, distance_colors
 
 # --- Functions for initialize rendering ---
 def get_block_size(canvas, size_x, size_y):
-    return int(min(canvas.get_width()/size_x, canvas.get_height()/size_y))
+    block_size = int(min(canvas.get_width()/size_x, canvas.get_height()/size_y))
+    return min(max(block_size, MIN_BLOCK_SIZE), MAX_BLOCK_SIZE)
 
 def get_dot_size(block_size, fraction):
     return int(block_size/fraction)
@@ -55,19 +88,33 @@ C_GOAL   = (255, 0, 0)
 C_PATH   = (0, 0, 255)
 C_TEXT   = (0, 0, 0)
 
-# --- Display init ---
+# --- Zoom limits, a block needs at least two pixels to fit the walls ---
+MIN_BLOCK_SIZE = 2
+MAX_BLOCK_SIZE = 64
+# --- Size (in cells) of the tiles the path is kept in ---
+TILE = 32
+# --- Size (in cells) of the square carved anew with C ---
+RECARVE_SIZE = 8
+# --- Larger mazes (in cells) get their distances from the start in the background ---
+FIELD_CELLS = 10_000
+
+# --- Display ---
+# The window, the surfaces and the font are made by init_display, so that this file
+# can be imported (e.g. by python -m maze or a new process) without opening a window
 win_x, win_y = 850, 600
-win = pygame.display.set_mode((win_x, win_y))
-pygame.display.set_caption("Maze Solver")
-win.fill(C_BG)
+win = None
 
 # --- Canvas - How big the maze is allowed to be ---
 canvas_x = int(2*win_x/3) + 1   # 2/3 of win
 canvas_y = win_y - 20 + 1     # Add one to both to make room for an additional ending line 
 offset_x = 10
 offset_y = 10
-canvas = pygame.Surface((canvas_x, canvas_y))
-canvas.fill(C_CANVAS)
+canvas = None
+# The maze without path, start and goal. Redrawn only when the maze or the view changes
+maze_surface = None
+# Position of the view in the whole maze, in pixels
+camera_x = 0
+camera_y = 0
 
 # --- Size of maze (To be changed of a possible user) ---
 SIZE_X = 30
@@ -75,84 +122,294 @@ SIZE_Y = 30
 
 # --- Size of a "block" of the path. Depends on canvas size and size of maze ---
 # Should always be quadratic. Calculated using the the maximum size that fits
-BLOCK_SIZE = get_block_size(canvas, SIZE_X, SIZE_Y)
-DOT_SIZE   = get_dot_size(BLOCK_SIZE, 3)
-
-# --- Graph and Solver initializer ---
-g = get_maze(SIZE_X, SIZE_Y)
+BLOCK_SIZE = None
+DOT_SIZE   = None
+
+# --- Graph and Solver, set by main ---
+g = None
+# Makes new mazes in the background, swapped in for g when done
+builder = None
+# The size of the maze asked for, which is not the size of g until it is done
+want_x, want_y = SIZE_X, SIZE_Y
 solver = Solver()
 path = []
+# Where every node of the path is: its index in path, and the nodes in every tile
+path_at = dict()
+path_tiles = defaultdict(set)
+# Built when first needed, for moving start and goal after the solver is finished
+maze_index = None
+# The distances from the start, made again when the start or the maze has changed
+distance_field = None
+# Makes the distances of a large maze in the background
+field_job = None
+# The distances as colours, one pixel per cell, together with the field they show
+heatmap = None
+heatmap_field = None
+show_heatmap = False
+# The start or goal of a large maze was moved and the path waits for the distances
+path_waits = False
 
 # --- Text ---
-pygame.font.init()
-font = pygame.font.SysFont('arial', 15, True)
+font = None
 textes = [
         "D - Start Depth-First-Search",
         "B - Start Breadth-First-Search",
         "R - Shuffle maze",
         "LEFT MOUSE - Move start",
-        "RIGHT MOUSE - Move goal"
+        "RIGHT MOUSE - Move goal",
+        "WHEEL or +/- - Zoom",
+        "MIDDLE MOUSE - Move view",
+        "C - Carve around mouse anew",
+        "H - Show distances from start"
         ]
 
 
 # --- Functions ---
+def init_display():
+    global win, canvas, maze_surface, font
+    win = pygame.display.set_mode((win_x, win_y))
+    pygame.display.set_caption("Maze Solver")
+    win.fill(C_BG)
+    canvas = pygame.Surface((canvas_x, canvas_y))
+    canvas.fill(C_CANVAS)
+    maze_surface = pygame.Surface((canvas_x, canvas_y))
+    pygame.font.init()
+    font = pygame.font.SysFont('arial', 15, True)
+
 def render_text(win, x, y, spacing=10):
     for text in textes:
         text_surface = font.render(text, False, C_TEXT)
         win.blit(text_surface, (x, y))
         y += text_surface.get_height() + spacing
 
-def draw_grid(win, size_x, size_y, block_size):
-    """ Used to draw a grid. """
-    for x in range(size_x + 1):
-        pygame.draw.line(win, C_LINE, (x*block_size, 0), (x*block_size, size_y*block_size), 1)
-    for y in range(size_y + 1):
-        pygame.draw.line(win, C_LINE, (0, y*block_size), (size_x*block_size, y*block_size), 1)
-
-def remove_wall(win, edge):
-    p1 = edge.fro.value
-    p2 = edge.to.value
-    dir_x = p2[0]-p1[0] # -1 means backwards, 0 same and 1 forward in x-direction
-    dir_y = p2[1]-p1[1] # -1 means backwards, 0 same and 1 forward in y-direction
-    # Which wall to remove
-    if dir_x < 0:
-        pygame.draw.line(win, C_CANVAS, (p2[0]*BLOCK_SIZE+BLOCK_SIZE, p2[1]*BLOCK_SIZE+1), (p2[0]*BLOCK_SIZE+BLOCK_SIZE, p2[1]*BLOCK_SIZE+BLOCK_SIZE-1), 1)
-        pass # Remove wall to the right of p2
-    elif dir_x > 0:
-        pygame.draw.line(win, C_CANVAS, (p1[0]*BLOCK_SIZE+BLOCK_SIZE, p1[1]*BLOCK_SIZE+1), (p1[0]*BLOCK_SIZE+BLOCK_SIZE, p1[1]*BLOCK_SIZE+BLOCK_SIZE-1), 1)
-        pass # Remove wall to the right of p1
-    elif dir_y < 0:
-        pygame.draw.line(win, C_CANVAS, (p2[0]*BLOCK_SIZE+1, p2[1]*BLOCK_SIZE+BLOCK_SIZE), (p2[0]*BLOCK_SIZE+BLOCK_SIZE-1, p2[1]*BLOCK_SIZE+BLOCK_SIZE), 1)
-        pass # Remove wall below p2
-    elif dir_y > 0:
-        pygame.draw.line(win, C_CANVAS, (p1[0]*BLOCK_SIZE+1, p1[1]*BLOCK_SIZE+BLOCK_SIZE), (p1[0]*BLOCK_SIZE+BLOCK_SIZE-1, p1[1]*BLOCK_SIZE+BLOCK_SIZE), 1)
-        pass # Remove wall below p1
-    else:
-        raise ValueError("Invalid edge")
+def render_progress(win, x, y, progress):
+    """ Draws (or with progress None, removes) the bar showing how much of a new maze
+        is done. Gives the part of the window that changed. """
+    rect = pygame.Rect(x, y, 200, 40)
+    win.fill(C_BG, rect)
+    if progress is not None:
+        text_surface = font.render(f"Creating {want_x}x{want_y} maze", False, C_TEXT)
+        win.blit(text_surface, (x, y))
+        bar = pygame.Rect(x, y + 25, 200, 10)
+        pygame.draw.rect(win, C_LINE, bar, 1)
+        win.fill(C_PATH, (bar.x, bar.y, int(bar.width*progress), bar.height))
+    return rect
+
+def visible_cells():
+    """ The cells inside the view, as x0 <= x < x1 and y0 <= y < y1. Includes one
+        cell more on every side, since the path is drawn slightly into the next cell. """
+    x0 = max(camera_x // BLOCK_SIZE - 1, 0)
+    y0 = max(camera_y // BLOCK_SIZE - 1, 0)
+    x1 = min((camera_x + canvas_x) // BLOCK_SIZE + 2, SIZE_X)
+    y1 = min((camera_y + canvas_y) // BLOCK_SIZE + 2, SIZE_Y)
+    return x0, y0, x1, y1
+
+def is_visible(pos):
+    x0, y0, x1, y1 = view
+    return x0 <= pos[0] < x1 and y0 <= pos[1] < y1
+
+def get_distance_field():
+    """ The distances from the start, found again only if the start or the maze changed.
+        For a large maze they are found in the background and None is given until
+        they are done. """
+    global distance_field, field_job
+    field = distance_field
+    if field is not None and field.start == g.index(start) and field.fingerprint == g.fingerprint():
+        return field
+    if len(g) <= FIELD_CELLS:
+        distance_field = DistanceField(g, start)
+        return distance_field
+    job = field_job
+    if job is None or job.start != g.index(start) or job.fingerprint != g.fingerprint():
+        if job is not None:
+            job.cancel()
+        field_job = FieldJob(g, start, C_CANVAS)
+    return None
+
+def take_field() -> bool:
+    """ Takes the distances of a FieldJob that is done. Tells if the view must be
+        drawn again for the new heatmap. """
+    global field_job, distance_field, heatmap, heatmap_field
+    # A failed job is kept, so it is not started again for the same start and maze.
+    # The old path and heatmap stay until the start or the maze is changed
+    if field_job is None or not field_job.finished:
+        return False
+    distance_field = field_job.field
+    heatmap = pygame.surfarray.make_surface(field_job.colors.swapaxes(0, 1))
+    heatmap_field = distance_field
+    field_job = None
+    return show_heatmap
+
+def get_heatmap():
+    """ The distances from the start as a surface with one pixel per cell. While the
+        distances of a large maze are found, the heatmap of the previous start is
+        given if the maze is the same, otherwise None. """
+    global heatmap, heatmap_field
+    field = get_distance_field()
+    if field is not None and heatmap_field is not field:
+        colors, reached = distance_colors(g, field.dist)
+        colors[~reached] = C_CANVAS
+        heatmap = pygame.surfarray.make_surface(colors.swapaxes(0, 1))
+        heatmap_field = field
+    if heatmap_field is None or heatmap_field.fingerprint != g.fingerprint():
+        return None
+    return heatmap
+
+def update_path(start_moved, dirty) -> bool:
+    """ Replaces the path after the start or the goal was moved, without searching.
+        In a large maze it waits for the distances from the start and keeps the old
+        path until they are found, since building an index for it would take as long.
+        Tells if the path was replaced. """
+    global maze_index
+    if start_moved and len(g) <= FIELD_CELLS:
+        # The index gives the path between any two cells, also while the start is dragged
+        if maze_index is None:
+            maze_index = MazeIndex(g)
+        replace_path(path, maze_index.path(start, goal), dirty)
+        return True
+    field = get_distance_field()
+    if field is None:
+        return False
+    replace_path(path, [Node(g.position(i)) for i in field.path(goal)], dirty)
+    return True
 
 def draw_maze(win):
+    """ Draws the visible part of the maze into maze_surface and clears the canvas with it.
+        Anything drawn on the canvas (path, start and goal) is gone after this. """
     # win.fill(C_BG)
-    canvas.fill(C_CANVAS)
-    draw_grid(canvas, SIZE_X, SIZE_Y, BLOCK_SIZE)
-    for e in g.edges:
-        remove_wall(canvas, e)
+    maze_surface.fill(C_CANVAS)
+    x0, y0, x1, y1 = view
+    if x0 < x1 and y0 < y1:
+        corner = (x0*BLOCK_SIZE - camera_x, y0*BLOCK_SIZE - camera_y)
+        heat = get_heatmap() if show_heatmap else None
+        if heat is not None:
+            cells = heat.subsurface((x0, y0, x1-x0, y1-y0))
+            maze_surface.blit(pygame.transform.scale(cells, ((x1-x0)*BLOCK_SIZE, (y1-y0)*BLOCK_SIZE)), corner)
+        image = np.empty(((y1-y0)*BLOCK_SIZE + 1, (x1-x0)*BLOCK_SIZE + 1, 3), dtype=np.uint8)
+        image[:] = C_CANVAS
+        draw_wall_arrays(image, *wall_window(g, x0, y0, x1, y1), BLOCK_SIZE, C_LINE)
+        # surfarray wants the pixels as columns
+        walls = pygame.surfarray.make_surface(image.swapaxes(0, 1))
+        if heat is not None:
+            # Only the walls are drawn over the heatmap
+            walls.set_colorkey(C_CANVAS)
+        maze_surface.blit(walls, corner)
+    canvas.blit(maze_surface, (0, 0))
     win.blit(canvas, (offset_x, offset_y))
 
+def draw_view(win):
+    """ Draws the maze and the path inside the view. """
+    draw_maze(win)
+    x0, y0, x1, y1 = view
+    indexes = []
+    for tx in range(x0 // TILE, (x1 - 1) // TILE + 1):
+        for ty in range(y0 // TILE, (y1 - 1) // TILE + 1):
+            indexes.extend(path_at[pos] for pos in path_tiles.get((tx, ty), ()))
+    draw_path_nodes(path, indexes, [])
+
+def set_view(x, y):
+    """ Moves the camera, keeping it inside the maze. """
+    global camera_x, camera_y, view
+    camera_x = min(max(x, 0), max(SIZE_X*BLOCK_SIZE + 1 - canvas_x, 0))
+    camera_y = min(max(y, 0), max(SIZE_Y*BLOCK_SIZE + 1 - canvas_y, 0))
+    view = visible_cells()
+
+def zoom(steps, around):
+    """ Zooms in (steps > 0) or out, keeping the point around (on the canvas) in place. """
+    global BLOCK_SIZE, DOT_SIZE
+    block_size = BLOCK_SIZE
+    for _ in range(abs(steps)):
+        if steps > 0:
+            block_size = max(block_size + 1, int(block_size*1.25))
+        else:
+            block_size = min(block_size - 1, int(block_size/1.25))
+    block_size = min(max(block_size, MIN_BLOCK_SIZE), MAX_BLOCK_SIZE)
+    x = (camera_x + around[0]) * block_size // BLOCK_SIZE - around[0]
+    y = (camera_y + around[1]) * block_size // BLOCK_SIZE - around[1]
+    BLOCK_SIZE = block_size
+    DOT_SIZE = get_dot_size(BLOCK_SIZE, 3)
+    set_view(x, y)
+
+def cell_rect(pos):
+    """ The part of the canvas a cell (and the path drawn in it) covers. """
+    return pygame.Rect(pos[0]*BLOCK_SIZE-1 - camera_x, pos[1]*BLOCK_SIZE-1 - camera_y, BLOCK_SIZE+3, BLOCK_SIZE+3).clip(canvas.get_rect())
+
+def restore_cell(pos, dirty):
+    if is_visible(pos):
+        rect = cell_rect(pos)
+        canvas.blit(maze_surface, rect, rect)
+        dirty.append(rect)
+
+def draw_path_nodes(path, indexes, dirty):
+    """ Draws the visible nodes of the path with the given indexes. draw_path_curved
+        does not draw the first and last node of what it is given, so every node is
+        given together with the nodes before and after it. """
+    for index in indexes:
+        if 0 < index < len(path)-1 and is_visible(path[index].value):
+            draw_path_curved(canvas, path[index-1:index+2], None, None)
+            dirty.append(cell_rect(path[index].value))
+
+def change_path(path, keep, added, dirty):
+    """ Keeps the first keep nodes of the drawn path and adds the nodes in added after them.
+        Only the cells that change are restored and redrawn. A node is drawn depending
+        on the nodes before and after it, so one more node is redrawn on each side. """
+    first = max(keep-1, 0)
+    for node in path[first:]:
+        restore_cell(node.value, dirty)
+    for node in path[keep:]:
+        pos = node.value
+        del path_at[pos]
+        path_tiles[pos[0] // TILE, pos[1] // TILE].discard(pos)
+    del path[keep:]
+    for index, node in enumerate(added, keep):
+        pos = node.value
+        path_at[pos] = index
+        path_tiles[pos[0] // TILE, pos[1] // TILE].add(pos)
+    path.extend(added)
+    draw_path_nodes(path, range(max(keep-2, 0), len(path)), dirty)
+
+def clear_path(path):
+    del path[:]
+    path_at.clear()
+    path_tiles.clear()
+
+def replace_path(path, new_path, dirty):
+    keep = 0
+    while keep < min(len(path), len(new_path)) and path[keep] == new_path[keep]:
+        keep += 1
+    change_path(path, keep, new_path[keep:], dirty)
+
+def draw_dot(pos, color, dirty):
+    if is_visible(pos):
+        center = (int(pos[0]*BLOCK_SIZE+BLOCK_SIZE/2) - camera_x, int(pos[1]*BLOCK_SIZE+BLOCK_SIZE/2) - camera_y)
+        dirty.append(pygame.draw.circle(canvas, color, center, DOT_SIZE))
+
+def move_dot(old, pos, path, dirty):
+    """ Removes a dot from where it was drawn, including the path under it. """
+    if old is None or old == pos:
+        return
+    restore_cell(old, dirty)
+    if old in path_at:
+        index = path_at[old]
+        draw_path_nodes(path, range(index-1, index+2), dirty)
+
 def draw_path_curved(win, path, start, goal):
     curve = lambda p1, p2: (p2[0]-p1[0], p2[1]-p1[1])
     blit_pos = lambda pos: (int(pos[0]*BLOCK_SIZE+BLOCK_SIZE/2), int(pos[1]*BLOCK_SIZE+BLOCK_SIZE/2))
     for index, node in enumerate(path[1:-1], 1):
+        # Corner of the cell in the view
+        x, y = BLOCK_SIZE*node.value[0] - camera_x, BLOCK_SIZE*node.value[1] - camera_y
         dir = curve(path[index-1].value, path[index+1].value)
         if dir[0] == 0:
             # Vertical
-            start = (BLOCK_SIZE*node.value[0]+1 + BLOCK_SIZE/2, BLOCK_SIZE*node.value[1]-1)
-            end   = (BLOCK_SIZE*node.value[0]+1 + BLOCK_SIZE/2, BLOCK_SIZE*node.value[1]-1 + BLOCK_SIZE)
+            start = (x+1 + BLOCK_SIZE/2, y-1)
+            end   = (x+1 + BLOCK_SIZE/2, y-1 + BLOCK_SIZE)
             pygame.draw.line(win, C_PATH, start, end, width=2)
             # win.blit(vertical, (BLOCK_SIZE*node.value[0]+1, BLOCK_SIZE*node.value[1]-1))
         elif dir[1] == 0:
             # Horizontal
-            start = (BLOCK_SIZE*node.value[0]-1, BLOCK_SIZE*node.value[1]+1 + BLOCK_SIZE/2)
-            end = (BLOCK_SIZE*node.value[0]-1 + BLOCK_SIZE, BLOCK_SIZE*node.value[1]+1 + BLOCK_SIZE/2)
+            start = (x-1, y+1 + BLOCK_SIZE/2)
+            end = (x-1 + BLOCK_SIZE, y+1 + BLOCK_SIZE/2)
             pygame.draw.line(win, C_PATH, start, end, width=2)
             # win.blit(horizontal, (BLOCK_SIZE*node.value[0]-1, BLOCK_SIZE*node.value[1]+1))
         elif dir[0] == 1 and dir[1] == 1:
@@ -161,7 +418,7 @@ def draw_path_curved(win, path, start, goal):
             prev_dir = curve(path[index-1].value, node.value)
             if prev_dir[0] == 1:
                 # Horizontal into this block
-                mid = (BLOCK_SIZE*node.value[0]+1, BLOCK_SIZE*node.value[1]+1 + BLOCK_SIZE)
+                mid = (x+1, y+1 + BLOCK_SIZE)
                 blit_rect = pygame.Rect(0, 0, BLOCK_SIZE, BLOCK_SIZE)
                 blit_rect.center = mid
                 start_angle = 0
@@ -170,7 +427,7 @@ def draw_path_curved(win, path, start, goal):
                 # win.blit(botleft, (BLOCK_SIZE*node.value[0]+1, BLOCK_SIZE*node.value[1]+1))
             else:
                 # Vertical into this block
-                mid = (BLOCK_SIZE*node.value[0]+1 + BLOCK_SIZE, BLOCK_SIZE*node.value[1]+1)
+                mid = (x+1 + BLOCK_SIZE, y+1)
                 blit_rect = pygame.Rect(0, 0, BLOCK_SIZE, BLOCK_SIZE)
                 blit_rect.center = mid
                 start_angle = math.pi
@@ -183,7 +440,7 @@ def draw_path_curved(win, path, start, goal):
             prev_dir = curve(path[index-1].value, node.value)
             if prev_dir[0] != 0:
                 # Horizontal into this block
-                mid = (BLOCK_SIZE*node.value[0]+1 + BLOCK_SIZE, BLOCK_SIZE*node.value[1]+1 + BLOCK_SIZE)
+                mid = (x+1 + BLOCK_SIZE, y+1 + BLOCK_SIZE)
                 blit_rect = pygame.Rect(0, 0, BLOCK_SIZE, BLOCK_SIZE)
                 blit_rect.center = mid
                 start_angle = math.pi/2
@@ -191,7 +448,7 @@ def draw_path_curved(win, path, start, goal):
                 pygame.draw.arc(win, C_PATH, blit_rect, start_angle, stop_angle, width=2)
             else:
                 # Vertical into this block
-                mid = (BLOCK_SIZE*node.value[0]+1, BLOCK_SIZE*node.value[1]+1)
+                mid = (x+1, y+1)
                 blit_rect = pygame.Rect(0, 0, BLOCK_SIZE, BLOCK_SIZE)
                 blit_rect.center = mid
                 start_angle = -math.pi/2
@@ -204,7 +461,7 @@ def draw_path_curved(win, path, start, goal):
             prev_dir = curve(path[index-1].value, node.value)
             if prev_dir[0] != 0:
                 # Horizontal into this block
-                mid = (BLOCK_SIZE*node.value[0]+1, BLOCK_SIZE*node.value[1]+1)
+                mid = (x+1, y+1)
                 blit_rect = pygame.Rect(0, 0, BLOCK_SIZE, BLOCK_SIZE)
                 blit_rect.center = mid
                 start_angle = -math.pi/2
@@ -213,7 +470,7 @@ def draw_path_curved(win, path, start, goal):
                 # win.blit(topleft, (BLOCK_SIZE*node.value[0]+1, BLOCK_SIZE*node.value[1]+1))
             else:
                 # Vertical into this block
-                mid = (BLOCK_SIZE*node.value[0]+1 + BLOCK_SIZE, BLOCK_SIZE*node.value[1]+1 + BLOCK_SIZE)
+                mid = (x+1 + BLOCK_SIZE, y+1 + BLOCK_SIZE)
                 blit_rect = pygame.Rect(0, 0, BLOCK_SIZE, BLOCK_SIZE)
                 blit_rect.center = mid
                 start_angle = math.pi/2
@@ -226,7 +483,7 @@ def draw_path_curved(win, path, start, goal):
             prev_dir = curve(path[index-1].value, node.value)
             if prev_dir[0] != 0:
                 # Horizontal into this block
-                mid = (BLOCK_SIZE*node.value[0]+1 + BLOCK_SIZE, BLOCK_SIZE*node.value[1]+1)
+                mid = (x+1 + BLOCK_SIZE, y+1)
                 blit_rect = pygame.Rect(0, 0, BLOCK_SIZE, BLOCK_SIZE)
                 blit_rect.center = mid
                 start_angle = math.pi
@@ -235,7 +492,7 @@ def draw_path_curved(win, path, start, goal):
                 # win.blit(topright, (BLOCK_SIZE*node.value[0]+1, BLOCK_SIZE*node.value[1]+1))
             else:
                 # Vertical into this block
-                mid = (BLOCK_SIZE*node.value[0]+1, BLOCK_SIZE*node.value[1]+1 + BLOCK_SIZE)
+                mid = (x+1, y+1 + BLOCK_SIZE)
                 blit_rect = pygame.Rect(0, 0, BLOCK_SIZE, BLOCK_SIZE)
                 blit_rect.center = mid
                 start_angle = 0
@@ -246,97 +503,192 @@ def draw_path_curved(win, path, start, goal):
        
 
 def get_coord(pos):
-    return (pos[0] // BLOCK_SIZE, pos[1] // BLOCK_SIZE)
+    return ((pos[0] - offset_x + camera_x) // BLOCK_SIZE, (pos[1] - offset_y + camera_y) // BLOCK_SIZE)
 
   
 # --- Main loop ---
-start = (0, 0)
-goal = (SIZE_X-1, SIZE_Y-1)
-redraw = 1
-solver_started = False
-mode = "DFS"
-
-render_text(win, canvas_x+20, 50)
-
-RUNNING = True
-while(RUNNING):
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            RUNNING = False
-    # Handle key presses
-    keys = pygame.key.get_pressed()
-    if keys[pygame.K_r]:
-        redraw = 20
-    if redraw > 0:
-        g = get_maze(SIZE_X, SIZE_Y)
-        path = []
-        solver_started = False
-        draw_maze(win)
-        redraw -= 1
-    if keys[pygame.K_d]:
-        mode = "DFS"
-        if not solver_started:
-            solver_started = True
-            solver.reset()
-            solver.set(g, Node(start), Node(goal), mode)
-    if keys[pygame.K_b]:
-        mode = "BFS"
-        if not solver_started:
-            solver_started = True
-            solver.reset()
-            solver.set(g, Node(start), Node(goal), mode)
-    # Resizing
-    if keys[pygame.K_UP]:
-        SIZE_X += 1
-        SIZE_Y += 1
-        BLOCK_SIZE = get_block_size(canvas, SIZE_X, SIZE_Y)
-        DOT_SIZE = get_dot_size(BLOCK_SIZE, 3)
-        g = get_maze(SIZE_X, SIZE_Y)
-        draw_maze(win)
-    # Reucing size gives some bugs that must be fixed before impl.
-    # Mouse input
-    if pygame.mouse.get_pressed()[0]:
-        if not solver_started:
-            pos = pygame.mouse.get_pos()
-            coord = get_coord(pos)
-            if 0 <= coord[0] < SIZE_X and 0 <= coord[1] < SIZE_Y: 
-                start = coord
-        elif solver.finished:
-            pos = pygame.mouse.get_pos()
-            coord = get_coord(pos)
-            if 0 <= coord[0] < SIZE_X and 0 <= coord[1] < SIZE_Y: 
-                start = coord
-            # Reset and create a new path
-            solver.reset()
-            solver.set(g, Node(start), Node(goal), mode)
-            path = solver.get_all()
-    if pygame.mouse.get_pressed()[2]:
-        if not solver_started:
-            pos = pygame.mouse.get_pos()
-            coord = get_coord(pos)
-            if 0 <= coord[0] < SIZE_X and 0 <= coord[1] < SIZE_Y: 
-                goal = coord
-        elif solver.finished:
-            pos = pygame.mouse.get_pos()
-            coord = get_coord(pos)
-            if 0 <= coord[0] < SIZE_X and 0 <= coord[1] < SIZE_Y: 
-                goal = coord
-            # Reset and create a new path
-            solver.reset()
-            solver.set(g, Node(start), Node(goal), mode)
-            path = solver.get_all()
-
-    if solver_started:
-        path = solver.next()
-        
+def main(maze=None, width=SIZE_X, height=SIZE_Y, seed=None):
+    """ Opens the window and runs until it is closed. Shows maze (a GridMaze) if
+        given, otherwise a new maze of width x height cells. """
+    global g, builder, SIZE_X, SIZE_Y, BLOCK_SIZE, DOT_SIZE, want_x, want_y, maze_index
+    global distance_field, field_job, heatmap, heatmap_field, show_heatmap, path_waits
+    global start, goal, solver_started, mode
+    init_display()
+    g = maze if maze is not None else get_grid_maze(width, height, seed)
+    SIZE_X, SIZE_Y = g.width, g.height
+    BLOCK_SIZE = get_block_size(canvas, SIZE_X, SIZE_Y)
+    DOT_SIZE   = get_dot_size(BLOCK_SIZE, 3)
+    builder = MazeBuilder()
+    want_x, want_y = SIZE_X, SIZE_Y
+
+    start = (0, 0)
+    goal = (SIZE_X-1, SIZE_Y-1)
+    solver_started = False
+    mode = "DFS"
+
+    render_text(win, canvas_x+20, 50)
+    # Where start and goal are drawn on the canvas
+    drawn_start = None
+    drawn_goal = None
+    # Everything is sent to the display the first frame and after the maze changes
+    full_update = True
+    set_view(0, 0)
     draw_maze(win)
-    pygame.draw.circle(canvas, C_START, (int(start[0]*BLOCK_SIZE+BLOCK_SIZE/2), int(start[1]*BLOCK_SIZE+BLOCK_SIZE/2)), DOT_SIZE)
-    pygame.draw.circle(canvas, C_GOAL, (int(goal[0]*BLOCK_SIZE+BLOCK_SIZE/2), int(goal[1]*BLOCK_SIZE+BLOCK_SIZE/2)), DOT_SIZE)
-    draw_path_curved(canvas, path, start, goal)
-    win.blit(canvas, (offset_x, offset_y))
+    # If the progress bar is shown
+    showing_progress = False
+
+    RUNNING = True
+    while(RUNNING):
+        view_changed = False
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                RUNNING = False
+            # Zooming and moving the view
+            elif event.type == pygame.MOUSEWHEEL:
+                pos = pygame.mouse.get_pos()
+                zoom(event.y, (pos[0] - offset_x, pos[1] - offset_y))
+                view_changed = True
+            elif event.type == pygame.KEYDOWN and event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                zoom(1, (canvas_x // 2, canvas_y // 2))
+                view_changed = True
+            elif event.type == pygame.KEYDOWN and event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                zoom(-1, (canvas_x // 2, canvas_y // 2))
+                view_changed = True
+            elif event.type == pygame.MOUSEMOTION and event.buttons[1]:
+                set_view(camera_x - event.rel[0], camera_y - event.rel[1])
+                view_changed = True
+            # Carving a part of the maze anew
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_c:
+                x, y = get_coord(pygame.mouse.get_pos())
+                if 0 <= x < SIZE_X and 0 <= y < SIZE_Y:
+                    half = RECARVE_SIZE // 2
+                    rect = (x - half, y - half, x + RECARVE_SIZE - half, y + RECARVE_SIZE - half)
+                    recarve(g, rect)
+                    if maze_index is not None:
+                        maze_index.repair(rect)
+                    if solver_started:
+                        # The path drawn may have been moved with the mouse since the solver found it
+                        if solver.finished:
+                            solver.set_path(list(path))
+                        step = solver.repair(rect)
+                        change_path(path, step.keep, step.added, [])
+                    view_changed = True
+            # A new maze once per key press, asking again would start it over
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_r:
+                builder.request(want_x, want_y)
+            # Resizing
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_UP:
+                want_x += 1
+                want_y += 1
+                builder.request(want_x, want_y)
+            # Reucing size gives some bugs that must be fixed before impl.
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_h:
+                show_heatmap = not show_heatmap
+                view_changed = True
+        # Handle key presses
+        keys = pygame.key.get_pressed()
+        dirty = []
+        # Swap in the new maze when it is done
+        new_maze = builder.take()
+        if new_maze is not None:
+            g = new_maze
+            if (SIZE_X, SIZE_Y) != (g.width, g.height):
+                SIZE_X, SIZE_Y = g.width, g.height
+                BLOCK_SIZE = get_block_size(canvas, SIZE_X, SIZE_Y)
+                DOT_SIZE = get_dot_size(BLOCK_SIZE, 3)
+                set_view(0, 0)
+            maze_index = None
+            if field_job is not None:
+                field_job.cancel()
+            distance_field = field_job = heatmap = heatmap_field = None
+            path_waits = False
+            clear_path(path)
+            # The solver still holds the old maze
+            solver_started = False
+            draw_maze(win)
+            drawn_start = drawn_goal = None
+            full_update = True
+        if keys[pygame.K_d]:
+            mode = "DFS"
+            if not solver_started:
+                solver_started = True
+                solver.reset()
+                solver.set(g, Node(start), Node(goal), mode)
+        if keys[pygame.K_b]:
+            mode = "BFS"
+            if not solver_started:
+                solver_started = True
+                solver.reset()
+                solver.set(g, Node(start), Node(goal), mode)
+        # Mouse input
+        old_start = start
+        if pygame.mouse.get_pressed()[0]:
+            if not solver_started:
+                pos = pygame.mouse.get_pos()
+                coord = get_coord(pos)
+                if 0 <= coord[0] < SIZE_X and 0 <= coord[1] < SIZE_Y: 
+                    start = coord
+            elif solver.finished:
+                pos = pygame.mouse.get_pos()
+                coord = get_coord(pos)
+                if 0 <= coord[0] < SIZE_X and 0 <= coord[1] < SIZE_Y: 
+                    start = coord
+                # The maze is a tree, so the new path is found without searching
+                path_waits = not update_path(True, dirty)
+        if pygame.mouse.get_pressed()[2]:
+            if not solver_started:
+                pos = pygame.mouse.get_pos()
+                coord = get_coord(pos)
+                if 0 <= coord[0] < SIZE_X and 0 <= coord[1] < SIZE_Y: 
+                    goal = coord
+            elif solver.finished:
+                pos = pygame.mouse.get_pos()
+                coord = get_coord(pos)
+                if 0 <= coord[0] < SIZE_X and 0 <= coord[1] < SIZE_Y: 
+                    goal = coord
+                # The distances from the start are kept, so the new path is walked
+                # back from the goal without searching
+                path_waits = not update_path(False, dirty)
+        # The heatmap shows the distances from the start
+        if show_heatmap and start != old_start:
+            view_changed = True
+        if take_field():
+            view_changed = True
+        if path_waits:
+            path_waits = not update_path(False, dirty)
+        if view_changed:
+            draw_view(win)
+            drawn_start = drawn_goal = None
+            full_update = True
+
+        if solver_started and not solver.finished:
+            # Only the part of the path that changed is given by the solver
+            step = solver.next()
+            change_path(path, step.keep, step.added, dirty)
+
+        move_dot(drawn_start, start, path, dirty)
+        move_dot(drawn_goal, goal, path, dirty)
+        draw_dot(start, C_START, dirty)
+        draw_dot(goal, C_GOAL, dirty)
+        drawn_start, drawn_goal = start, goal
+
+        # Progress of a new maze, drawn next to the canvas
+        progress_rects = []
+        if builder.busy or showing_progress:
+            showing_progress = builder.busy
+            progress_rects.append(render_progress(win, canvas_x+20, win_y - 100, builder.progress if builder.busy else None))
+
+        if full_update:
+            win.blit(canvas, (offset_x, offset_y))
+            pygame.display.update()
+            full_update = False
+        else:
+            rects = [rect.move(offset_x, offset_y) for rect in dirty]
+            for rect, area in zip(rects, dirty):
+                win.blit(canvas, rect, area)
+            pygame.display.update(rects + progress_rects)
+        pygame.time.Clock().tick(60)
+
 
-    
-    pygame.display.update()
-    pygame.time.Clock().tick(60)
-    
-    
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+""" service.py """
+
+"""
+A small local HTTP service creating, solving and measuring mazes, so that many
+programs can share one running engine instead of each creating their own mazes.
+
+Run it with
+
+    python service.py --port 8765
+    python service.py --unix /tmp/maze.sock
+
+Endpoints (GET with the parameters in the query string, or POST with a JSON object):
+
+/generate - width, height, algorithm, seed. Gives the maze in the binary format of
+            mazefile.py (load it with mazefile.loads_maze). The seed is also given
+            in the header X-Maze-Seed, so a maze made without a seed can be used
+            again by the other endpoints.
+/solve    - width, height, algorithm, seed, start, goal, mode. Gives the path from
+            start to goal as JSON: {"path": [[x, y], ...], "length": steps}.
+            start and goal are "x,y" in a query string or [x, y] in JSON.
+/stats    - width, height, algorithm, seed, start. Gives the MazeStats of the maze
+            (see mazestats.py) as JSON.
+
+A maze is identified by (width, height, algorithm, seed), since the same seed
+always gives the same maze. The mazes that were used most recently are kept in a
+bounded cache, packed as in a maze file (about 2 bits per cell). The packed maze
+is also what is sent to the workers.
+
+All work on mazes is done in a pool of processes, so the server keeps answering
+while a large maze is made. If a request comes in that is the same as one that is
+not done yet (e.g. many programs asking for the same maze at once) it waits for the
+answer of the first one instead of doing the work again.
+
+The server only uses the standard library, one request per connection.
+
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import signal
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qsl
+
+from Graph import Node
+from maze import build_maze, _generator
+from mazefile import check_seed, dumps_maze, loads_maze
+from mazestats import maze_stats
+from solver import Solver, STRATEGIES
+
+
+# The largest maze that can be asked for, in cells
+MAX_CELLS = 25_000_000
+# The largest request body accepted, in bytes
+MAX_BODY = 1 << 16
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+# Workers forked from the server would keep copies of the open client sockets, so
+# closing a connection would not end it until the worker stops
+if "forkserver" in multiprocessing.get_all_start_methods():
+    _pool_context = multiprocessing.get_context("forkserver")
+else:
+    _pool_context = multiprocessing.get_context("spawn")
+
+
+class RequestError(Exception):
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# --- Work done in the worker processes ---
+
+def _init_worker():
+    # Ctrl-C stops the server, which then stops its workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _generate(width, height, algorithm, seed) -> bytes:
+    return dumps_maze(build_maze(width, height, algorithm, seed))
+
+
+def _solve(data, start, goal, mode) -> list:
+    solver = Solver()
+    solver.set(loads_maze(data), Node(start), Node(goal), mode)
+    return [node.value for node in solver.get_all()]
+
+
+def _stats(data, start) -> dict:
+    stats = maze_stats(loads_maze(data), start)._asdict()
+    stats["distances"] = stats["distances"].tolist()
+    return stats
+
+
+# --- Parameters ---
+
+def _int(params, name, default=None) -> int:
+    value = params.get(name, default)
+    if value is None:
+        raise RequestError(400, f"{name} is missing")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RequestError(400, f"{name} must be an integer") from None
+
+
+def _position(params, name, default=None) -> tuple:
+    value = params.get(name, default)
+    if value is None:
+        raise RequestError(400, f"{name} is missing")
+    if isinstance(value, str):
+        value = value.split(",")
+    try:
+        x, y = (int(v) for v in value)
+    except (TypeError, ValueError):
+        raise RequestError(400, f"{name} must be given as x,y") from None
+    return (x, y)
+
+
+def _maze_key(params) -> tuple:
+    width = _int(params, "width")
+    height = _int(params, "height")
+    if width < 1 or height < 1 or width*height > MAX_CELLS:
+        raise RequestError(400, f"The maze must have between 1 and {MAX_CELLS} cells")
+    algorithm = str(params.get("algorithm", "kruskal"))
+    try:
+        _generator(algorithm)
+    except ValueError as error:
+        raise RequestError(400, str(error)) from None
+    seed = params.get("seed")
+    seed = random.getrandbits(63) if seed is None else _int(params, "seed")
+    # The seed is stored in the packed maze, checked before the maze is made
+    try:
+        check_seed(seed)
+    except ValueError as error:
+        raise RequestError(400, str(error)) from None
+    return (width, height, algorithm, seed)
+
+
+def _check_cell(key, position, name):
+    width, height = key[:2]
+    if not (0 <= position[0] < width and 0 <= position[1] < height):
+        raise RequestError(400, f"{name} is outside the maze")
+
+
+class MazeService:
+
+    def __init__(self, workers: int=None, cache_size: int=64):
+        self.pool = ProcessPoolExecutor(workers, mp_context=_pool_context,
+                                        initializer=_init_worker)
+        # Packed mazes by (width, height, algorithm, seed), least recently used first
+        self.mazes = OrderedDict()
+        self.cache_size = cache_size
+        # Requests that are not done yet, by what they ask for
+        self.pending = dict()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def _once(self, key, work):
+        """ Runs work() (a coroutine function) for key, unless the same key is already
+            running, in which case its answer is awaited instead. """
+        task = self.pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(work())
+            self.pending[key] = task
+            task.add_done_callback(lambda _: self.pending.pop(key, None))
+        else:
+            self.coalesced += 1
+        # A client going away must not cancel the work other clients are waiting for
+        return await asyncio.shield(task)
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, function, *args)
+
+    async def maze(self, key) -> bytes:
+        """ Gives the packed maze for (width, height, algorithm, seed). """
+        data = self.mazes.get(key)
+        if data is not None:
+            self.hits += 1
+            self.mazes.move_to_end(key)
+            return data
+        self.misses += 1
+
+        async def generate():
+            data = await self._run(_generate, *key)
+            self.mazes[key] = data
+            if len(self.mazes) > self.cache_size:
+                self.mazes.popitem(last=False)
+            return data
+
+        return await self._once(("maze",) + key, generate)
+
+    async def generate(self, params) -> tuple:
+        key = _maze_key(params)
+        data = await self.maze(key)
+        return 200, "application/octet-stream", data, {"X-Maze-Seed": str(key[3])}
+
+    async def solve(self, params) -> tuple:
+        key = _maze_key(params)
+        start = _position(params, "start", (0, 0))
+        goal = _position(params, "goal", (key[0] - 1, key[1] - 1))
+        _check_cell(key, start, "start")
+        _check_cell(key, goal, "goal")
+        mode = str(params.get("mode", "BFS"))
+        if not mode in STRATEGIES:
+            raise RequestError(400, "The mode must be one of " + ", ".join(STRATEGIES))
+
+        async def solve():
+            data = await self.maze(key)
+            return await self._run(_solve, data, start, goal, mode)
+
+        path = await self._once(("solve", key, start, goal, mode), solve)
+        return self._json({"path": path, "length": len(path) - 1, "seed": key[3]})
+
+    async def stats(self, params) -> tuple:
+        key = _maze_key(params)
+        start = _position(params, "start", (0, 0))
+        _check_cell(key, start, "start")
+
+        async def stats():
+            data = await self.maze(key)
+            return await self._run(_stats, data, start)
+
+        stats = await self._once(("stats", key, start), stats)
+        return self._json(dict(stats, seed=key[3]))
+
+    def _json(self, value) -> tuple:
+        return 200, "application/json", json.dumps(value).encode(), {}
+
+    async def _read_request(self, reader) -> tuple:
+        """ Gives the path and the parameters of an HTTP request. """
+        line = await reader.readline()
+        try:
+            method, target, _ = line.decode("latin-1").split()
+        except ValueError:
+            raise RequestError(400, "Malformed request line") from None
+        length = 0
+        while True:
+            header = await reader.readline()
+            if header in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = header.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = _int({"length": value.strip()}, "length")
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query))
+        if method == "POST":
+            if length > MAX_BODY:
+                raise RequestError(413, "The request is too large")
+            if length:
+                try:
+                    body = json.loads(await reader.readexactly(length))
+                except ValueError:
+                    raise RequestError(400, "The body must be a JSON object") from None
+                if not isinstance(body, dict):
+                    raise RequestError(400, "The body must be a JSON object")
+                params.update(body)
+        elif method != "GET":
+            raise RequestError(405, "Only GET and POST are supported")
+        return url.path, params
+
+    async def handle(self, reader, writer):
+        """ Answers one HTTP request. """
+        endpoints = {"/generate": self.generate, "/solve": self.solve, "/stats": self.stats}
+        try:
+            path, params = await self._read_request(reader)
+            if not path in endpoints:
+                raise RequestError(404, f"No endpoint {path}")
+            status, kind, body, headers = await endpoints[path](params)
+        except RequestError as error:
+            status, kind, body, headers = error.status, "application/json", \
+                json.dumps({"error": str(error)}).encode(), {}
+        except Exception as error:
+            status, kind, body, headers = 500, "application/json", \
+                json.dumps({"error": repr(error)}).encode(), {}
+        head = [f"HTTP/1.1 {status} {REASONS[status]}", f"Content-Type: {kind}",
+                f"Content-Length: {len(body)}", "Connection: close"]
+        head += [f"{name}: {value}" for name, value in headers.items()]
+        try:
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            # The client did not wait for the answer
+            pass
+
+    async def serve(self, host="127.0.0.1", port=8765, path=None):
+        """ Serves requests until cancelled, on a Unix socket if path is given,
+            otherwise on host and port. """
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serves mazes over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="serve on this Unix socket instead")
+    parser.add_argument("--workers", type=int, help="number of worker processes")
+    parser.add_argument("--cache", type=int, default=64, help="number of mazes to keep")
+    args = parser.parse_args(argv)
+    service = MazeService(args.workers, args.cache)
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,122 +1,520 @@
 """ solver.py """
 
 """
-This file contains function for solving a maze 
+This file contains function for solving a maze
 by finding the shortest path from one node (or position) to another.
 
+The order in which the nodes are visited is decided by a strategy. The strategies are
+registered by name in STRATEGIES and chosen with the mode given to Solver.set():
+
+BFS           - Breadth-first search, shortest path in number of steps
+DFS           - Depth-first search, finds a path but not necessarily the shortest
+DIJKSTRA      - Shortest path using the cost of the edges
+ASTAR         - A* with the Manhattan distance to the goal as heuristic
+BIDIRECTIONAL - Breadth-first search from both the start and the goal until they meet
+DEADEND       - Dead-end filling, prunes every dead end until only the path is left
+
+New strategies are added by subclassing Strategy and decorating the class with
+@register_strategy("NAME").
+
+Every node is marked as visited when it is added to the collection, together with
+the node it was reached from (its parent). The path to any visited node can then be
+found by following the parents back to the start.
+
+next() does not give a copy of the whole path. It gives a Step telling how the path
+to the node just visited differs from the previous one:
+
+keep  - how many nodes from the start of the previous path are still in the path
+added - the nodes that follow them
+
+The full path is only rebuilt when it is asked for, e.g. by get_all().
+
+A Solver can be given a SolverStats (see instrument.py) counting the visited nodes,
+duplicate pushes, the largest collection and the path rebuilds, and timing the search.
+
+A Solver can be given a PathCache. get_all() then first looks for the path in the
+cache, using the fingerprint of the graph, the start, the goal and the mode as key.
+A changed graph gets a new fingerprint, so old paths are never given for it.
+
+When a rectangle of a GridMaze is carved anew with maze.recarve, repair(rect) updates
+a found path instead of searching again. Only the parts of the path inside the
+rectangle can change, and each of them is replaced by the new path between the same
+two cells.
+
 """
 
 
-from ast import Str
-from collections import deque
+from collections import deque, namedtuple, OrderedDict
+from heapq import heappush, heappop
+from itertools import count
 
-class Entry:
-    """ Wrapper class used to easily find the way back when goal is reached """
+from Graph import Node
+from instrument import SolverStats
 
-    def __init__(self, node, backpointer):
-        self.node = node
-        self.backpointer = backpointer
 
+Step = namedtuple("Step", ["keep", "added"])
 
-class Solver:
+STRATEGIES = dict()
+
+
+def register_strategy(name):
+    """ Class decorator adding a strategy to STRATEGIES under the given name. """
+    def register(cls):
+        STRATEGIES[name] = cls
+        return cls
+    return register
+
+
+class Strategy:
+    """ Base class for the strategies. Keeps the parent of every visited node and
+        visits the nodes in the order given by push() and pop(). """
+
+    def __init__(self, graph, start, goal):
+        self.graph = graph
+        self.start = start
+        self.goal = goal
+        self.parent = {start: None}
+        self.found = False
+        # Nodes added to the collection more than once
+        self.duplicates = 0
+        self.push(start)
+
+    def push(self, node):
+        raise NotImplementedError
+
+    def pop(self):
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def expand(self):
+        """ Visits the next node and adds its unvisited neighbours.
+            Returns the visited node, or None if there is nothing left to visit. """
+        if not len(self):
+            return None
+        node = self.pop()
+        if node == self.goal:
+            self.found = True
+            return node
+        for to in self.graph.neighbors(node):
+            if not to in self.parent:
+                self.parent[to] = node
+                self.push(to)
+        return node
+
+    def parent_of(self, node):
+        return self.parent[node]
+
+    def path(self) -> list:
+        """ Rebuilds the path from the start to the goal using the parents. """
+        if not self.found:
+            return []
+        path = []
+        node = self.goal
+        while(node is not None):
+            path.append(node)
+            node = self.parent[node]
+        path.reverse()
+        return path
 
-    def __init__(self):
+
+@register_strategy("BFS")
+class BreadthFirst(Strategy):
+
+    def __init__(self, graph, start, goal):
         self.collection = deque()
-        self.visited = set()
+        super().__init__(graph, start, goal)
+
+    def push(self, node):
+        self.collection.append(node)
+
+    def pop(self):
+        return self.collection.popleft()
+
+    def __len__(self) -> int:
+        return len(self.collection)
+
+
+@register_strategy("DFS")
+class DepthFirst(BreadthFirst):
+
+    def pop(self):
+        return self.collection.pop()
+
+
+@register_strategy("DIJKSTRA")
+class Dijkstra(Strategy):
+    """ A node can be reached again with a lower cost after it has been added,
+        so a node is only done when it is popped (the heap may contain old entries). """
+
+    def __init__(self, graph, start, goal):
+        self.collection = []
+        self.cost = {start: 0}
+        self.done = set()
+        # Breaks ties so that the nodes themselves are never compared
+        self.counter = count()
+        super().__init__(graph, start, goal)
+
+    def adjacent(self, node):
+        """ Gives all neighbours of a node together with the cost to go there. """
+        for e in self.graph.get_edges2(node):
+            yield (e.to if not e.to == node else e.fro), e.cost
+
+    def heuristic(self, node) -> float:
+        return 0
+
+    def push(self, node):
+        heappush(self.collection, (self.cost[node] + self.heuristic(node), next(self.counter), node))
+
+    def pop(self):
+        while True:
+            _, _, node = heappop(self.collection)
+            if not node in self.done:
+                self.done.add(node)
+                return node
+
+    def __len__(self) -> int:
+        # Remove old entries of nodes already done so an empty heap means empty
+        while self.collection and self.collection[0][2] in self.done:
+            heappop(self.collection)
+        return len(self.collection)
+
+    def expand(self):
+        if not len(self):
+            return None
+        node = self.pop()
+        if node == self.goal:
+            self.found = True
+            return node
+        for to, cost in self.adjacent(node):
+            cost += self.cost[node]
+            if not to in self.done and (not to in self.cost or cost < self.cost[to]):
+                if to in self.cost:
+                    self.duplicates += 1
+                self.cost[to] = cost
+                self.parent[to] = node
+                self.push(to)
+        return node
+
+
+@register_strategy("ASTAR")
+class AStar(Dijkstra):
+    """ Every step costs 1, which makes the Manhattan distance to the goal
+        a heuristic that never overestimates. Nodes must have (x, y) values. """
+
+    def adjacent(self, node):
+        for to in self.graph.neighbors(node):
+            yield to, 1
+
+    def heuristic(self, node) -> float:
+        return abs(node.value[0] - self.goal.value[0]) + abs(node.value[1] - self.goal.value[1])
+
+
+@register_strategy("BIDIRECTIONAL")
+class Bidirectional(Strategy):
+    """ Breadth-first search from the start and from the goal at the same time,
+        always continuing on the side with the smallest collection. The path is
+        found when a node visited from one side is reached from the other.
+        In a maze there is only one path, in graphs with cycles it can be
+        one step longer than the shortest. """
+
+    def __init__(self, graph, start, goal):
+        self.forward = deque([start])
+        self.backward = deque([goal])
+        self.parent_back = {goal: None}
+        self.meeting = None
+        self.graph = graph
+        self.start = start
+        self.goal = goal
+        self.parent = {start: None}
+        self.duplicates = 0
+        self.found = start == goal
+        if self.found:
+            self.meeting = (start, None)
+
+    def __len__(self) -> int:
+        return len(self.forward) + len(self.backward)
+
+    def expand(self):
+        if not self.forward or not self.backward:
+            return None
+        if len(self.forward) <= len(self.backward):
+            collection, parent, other = self.forward, self.parent, self.parent_back
+        else:
+            collection, parent, other = self.backward, self.parent_back, self.parent
+        node = collection.popleft()
+        for to in self.graph.neighbors(node):
+            if to in other:
+                self.found = True
+                self.meeting = (node, to) if parent is self.parent else (to, node)
+                return node
+            if not to in parent:
+                parent[to] = node
+                collection.append(to)
+        return node
+
+    def parent_of(self, node):
+        # Nodes visited from the goal side lead back to the goal
+        return self.parent[node] if node in self.parent else self.parent_back[node]
+
+    def path(self) -> list:
+        if not self.found:
+            return []
+        fro, to = self.meeting
+        path = []
+        while(fro is not None):
+            path.append(fro)
+            fro = self.parent[fro]
+        path.reverse()
+        while(to is not None):
+            path.append(to)
+            to = self.parent_back[to]
+        return path
+
+
+@register_strategy("DEADEND")
+class DeadEnd(Strategy):
+    """ Fills the dead ends of the maze until only the path is left, see
+        DeadEndFilling.py. All the work is done by the first expand(), with NumPy
+        on the wall arrays instead of node by node. Nodes must have (x, y) values. """
+
+    def __init__(self, graph, start, goal):
+        self.graph = graph
+        self.start = start
+        self.goal = goal
+        self.filling = None
+        self.duplicates = 0
+        self.found = False
+
+    def __len__(self) -> int:
+        return 0 if self.filling is not None else 1
+
+    def expand(self):
+        if self.filling is not None:
+            return None
+        # Imported here so that solving without it does not need NumPy
+        from DeadEndFilling import DeadEndFilling
+        self.filling = DeadEndFilling(self.graph, self.start, [self.goal])
+        self.found = self.filling.distance(self.goal) >= 0
+        return self.goal if self.found else None
+
+    def path(self) -> list:
+        if not self.found:
+            return []
+        return [Node(self.filling.maze.position(i)) for i in self.filling.path(self.goal)]
+
+
+class PathCache:
+    """ Keeps the most recently used paths, up to maxsize of them. """
+
+    def __init__(self, maxsize: int=1024):
+        self.maxsize = maxsize
+        self.paths = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def get(self, key):
+        """ Gives the path stored for key, or None. """
+        path = self.paths.get(key)
+        if path is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.paths.move_to_end(key)
+        return path
+
+    def put(self, key, path):
+        self.paths[key] = tuple(path)
+        self.paths.move_to_end(key)
+        if len(self.paths) > self.maxsize:
+            self.paths.popitem(last=False)
+
+    def invalidate(self, graph):
+        """ Removes all paths of a graph, e.g. one that will not be used again. """
+        for key in [key for key in self.paths if key[0][0] == graph.uid]:
+            del self.paths[key]
+
+    def clear(self):
+        self.paths.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+class Solver:
+
+    def __init__(self, cache: PathCache=None, stats: SolverStats=None):
+        self.cache = cache
+        self.stats = stats
+        self.strategy = None
         self.graph = None
         self.start = None
         self.goal = None
         self.path = []
+        self.on_path = dict()
         self.finished = False
         self.mode = None
 
-    def set_mode(self, mode: Str):
-        if not mode in ("BFS", "DFS"):
-            raise ValueError("The mode must either be BFS or DFS")
+    def set_mode(self, mode: str):
+        if not mode in STRATEGIES:
+            raise ValueError("The mode must be one of " + ", ".join(STRATEGIES))
         self.mode = mode
 
     def set(self, graph, start, goal, mode):
+        self.set_mode(mode)
         self.graph = graph
         self.start = start
         self.goal = goal
-        self.collection.append(Entry(start, None))
-        self.set_mode(mode)
+        self.strategy = STRATEGIES[mode](graph, start, goal)
 
     def reset(self):
-        self.collection.clear()
-        self.visited.clear()
+        self.strategy = None
         self.path = []
+        self.on_path.clear()
         self.finished = False
 
 
     def BFS(self, graph, start, goal):
 
-        
+
         # Create a collection
-        # Create a set with visited nodes - combined with what node it came from
+        # Create a dict with visited nodes - combined with what node it came from
         # Add start node to the collection
         # While collection is not empty:
         #   Decollection a node
         #   If goal: found it. Quit loop
-        #   For all its edges:
-        #       If not going to a visited node:
-        #           Add node to collection together with what it came from
-        #   Check what previous node this node came from
-        #   Add to visited.
-        self.mode = "BFS"
-        self.graph = graph
-        self.start = start
-        self.goal = goal
-        self.path = []
-        self.finished = False
-        self.collection.clear()
-        self.visited.clear()
-        self.collection.append(Entry(start, None))
+        #   For all its neighbours:
+        #       If not visited:
+        #           Mark as visited and add to collection together with what it came from
+        self.reset()
+        self.set(graph, start, goal, "BFS")
 
     def DFS(self, graph, start, goal):
-        self.mode = "DFS"
-        self.graph = graph
-        self.start = start
-        self.goal = goal
-        self.path = []
-        self.finished = False
-        self.collection.clear()
-        self.visited.clear()
-        self.collection.append(Entry(start, None))
+        self.reset()
+        self.set(graph, start, goal, "DFS")
 
 
-    def next(self):
-        if self.finished:
-            return self.path
-        if self.mode == "BFS":
-            entry = self.collection.popleft()
-        elif self.mode == "DFS":
-            entry = self.collection.pop()
-        if entry.node == self.goal:
+    def expand(self):
+        """ Lets the strategy visit the next node. Returns the visited node,
+            or None if there is nothing left to visit. """
+        node = self.strategy.expand()
+        if node is None or self.strategy.found:
             self.finished = True
-            return self.get_path(entry)
-        edges = self.graph.get_edges2(entry.node)
-        for edge in edges:
-            # Get the "other" node
-            to = edge.to if not edge.to == entry.node else edge.fro
-            if not to in self.visited:
-                self.collection.append(Entry(to, entry))
-        self.visited.add(entry.node)
-        return self.get_path(entry)
+        stats = self.stats
+        if stats is not None:
+            if node is not None:
+                stats.expanded += 1
+            stats.peak_frontier = max(stats.peak_frontier, len(self.strategy))
+            if self.finished:
+                stats.duplicate_pushes += self.strategy.duplicates
+        return node
+
+    def next(self) -> Step:
+        if self.finished:
+            return Step(len(self.path), [])
+        node = self.expand()
+        if self.finished:
+            # The path to the goal is not always the path to the last visited node
+            return self.replace_path(self.rebuild_path())
+        return self.move_path(node)
 
     def get_all(self):
-        while not self.finished:
-            self.path = self.next()
-        return self.path
+        if self.finished:
+            # Found before (or taken from the cache), the strategy may not have run
+            return list(self.path)
+        if self.cache is not None:
+            key = (self.graph.fingerprint(), self.start, self.goal, self.mode)
+            path = self.cache.get(key)
+            if path is None:
+                path = self.search()
+                self.cache.put(key, path)
+            self.finished = True
+            self.set_path(list(path))
+            return list(self.path)
+        self.set_path(self.search())
+        return list(self.path)
 
+    def search(self) -> list:
+        """ Lets the strategy run until it is finished and gives the path. """
+        if self.stats is None:
+            while not self.finished:
+                self.expand()
+            return self.strategy.path()
+        with self.stats.phase("search"):
+            while not self.finished:
+                self.expand()
+        return self.rebuild_path()
 
-    def get_path(self, entry):
-        path = []
-        while(entry is not None):
-            path.append(entry.node)
-            entry = entry.backpointer
-        path.reverse()
+    def rebuild_path(self) -> list:
+        if self.stats is None:
+            return self.strategy.path()
+        self.stats.path_rebuilds += 1
+        with self.stats.phase("path"):
+            return self.strategy.path()
+
+    def move_path(self, node) -> Step:
+        """ Changes the path to end at node instead. Only the part of the path that
+            differs is walked, which for DFS is usually a single node. """
+        added = []
+        while node is not None and not node in self.on_path:
+            added.append(node)
+            node = self.strategy.parent_of(node)
+        keep = 0 if node is None else self.on_path[node] + 1
+        for removed in self.path[keep:]:
+            del self.on_path[removed]
+        del self.path[keep:]
+        added.reverse()
+        for node in added:
+            self.on_path[node] = len(self.path)
+            self.path.append(node)
+        return Step(keep, added)
+
+    def replace_path(self, path) -> Step:
+        keep = 0
+        while keep < min(len(path), len(self.path)) and path[keep] == self.path[keep]:
+            keep += 1
+        added = path[keep:]
+        self.set_path(path)
+        return Step(keep, added)
+
+    def set_path(self, path):
         self.path = path
-        return path
+        self.on_path = {node: index for index, node in enumerate(path)}
 
+    def get_path(self):
+        return list(self.path)
 
+    def repair(self, rect) -> Step:
+        """ Updates the solver after the rectangle rect (x0, y0, x1, y1) of its
+            GridMaze was carved anew by maze.recarve. A found path is mended where it
+            goes through the rectangle, which takes time proportional to the length
+            of the path and the size of the rectangle. An unfinished search is started
+            over. Gives how the path changed. """
+        graph = self.graph
+        if not self.finished:
+            self.reset()
+            self.set(graph, self.start, self.goal, self.mode)
+            return Step(0, [])
+        x0, y0, x1, y1 = graph.clip(rect)
+        path = []
+        inside = []
+        for node in self.path + [None]:
+            if node is not None:
+                x, y = node.value
+                if x0 <= x < x1 and y0 <= y < y1:
+                    inside.append(node)
+                    continue
+            # A part of the path inside the rectangle stays between the same two cells,
+            # since the rest of the maze is the same
+            if inside:
+                cells = graph.region_path(graph.index(inside[0]), graph.index(inside[-1]), rect)
+                path.extend(Node(graph.position(i)) for i in cells)
+                inside = []
+            if node is not None:
+                path.append(node)
+        if self.cache is not None:
+            self.cache.put((graph.fingerprint(), self.start, self.goal, self.mode), path)
+        return self.replace_path(path)